@@ -1,11 +1,13 @@
 import argparse
 import sys
 import os
+import glob
+from multiprocessing import Pool
 
 from src.conf import conf
 from src.learn.base import annotate
 from src.learn.target_encoding import Q3_MAPPING, TYPE_MAPPING
-from src.util import get_id
+from src.util import get_id, absolute_file_paths
 
 PARSER_DESCRIPTION = ("Annotates PDB file with secondary structure elements "
                       "and prints final annotation to PDBID_predicted files "
@@ -38,25 +40,181 @@ def strand_annotate(pos, sheets):
     return ' ', ' '
 
 
+def annotation_rows(pdb_path):
+    """
+    Annotates a PDB file with the predictors of the central configuration.
+
+    :param pdb_path: Path to the PDB file to be annotated.
+    :return: 2-tuple with the rows of the predicted and the true annotation.
+    Each row consists of the position of a residue, its class, its Q3 symbol,
+    its type, and the sheet and orientation of the residue.
+    """
+    # annotate given PDB file
+    result = annotate(pdb_path)
+
+    if result[0] is None:
+        raise ValueError('No windows could be extracted from ' + pdb_path)
+
+    (true_expand, pred_expand, true_sheets, pred_sheets) = result
+
+    return (_rows(pred_expand, pred_sheets), _rows(true_expand, true_sheets))
+
+
+def _rows(expand, sheets):
+
+    rows = []
+
+    for (pos, cls) in expand.items():
+
+        sheet_id, orient = strand_annotate(pos, sheets)
+
+        rows.append([pos, cls, Q3_MAPPING[cls], TYPE_MAPPING[cls],
+                     sheet_id, orient])
+
+    return rows
+
+
+def write_annotation(pdb_path, out_dir):
+    """
+    Annotates a PDB file with the predictors of the central configuration
+    and writes the predicted and the true annotation to the files
+    PDBID_predicted and PDBID_true in `out_dir`.
+
+    :param pdb_path: Path to the PDB file to be annotated.
+    :param out_dir: Directory the output files are written to.
+    """
+    # get PDBID
+    pdbid = get_id(pdb_path)
+
+    (predicted, true) = annotation_rows(pdb_path)
+
+    for (suffix, rows) in (('_predicted', predicted), ('_true', true)):
+
+        with open(out_dir + os.path.sep + pdbid + suffix, 'w') as f:
+
+            for row in rows:
+                f.write('\t'.join(map(str, row)) + os.linesep)
+
+
+def collect_pdb_files(sources, manifest=None):
+    """
+    Determines the PDB files of a batch.
+
+    :param sources: Paths to PDB files or directories, or glob patterns.
+    :param manifest: Path to a file that lists one PDB file per line.
+    :return: List of the paths of all PDB files of the batch, together with
+    a list of the sources that do not refer to any file.
+    """
+    pdb_files = []
+    missing = []
+
+    if manifest is not None:
+        with open(manifest, 'r') as f:
+            sources = list(sources) + [line.strip() for line in f
+                                       if line.strip()]
+
+    for source in sources:
+
+        if os.path.isdir(source):
+            pdb_files.extend(sorted(absolute_file_paths(source)))
+        else:
+            matches = sorted(glob.glob(source))
+
+            if matches:
+                pdb_files.extend(os.path.abspath(match) for match in matches
+                                 if os.path.isfile(match))
+            else:
+                missing.append(source)
+
+    return pdb_files, missing
+
+
+def _annotate_file(job):
+    """
+    Annotates a single PDB file of a batch.
+
+    :return: Path to the PDB file together with the error message, which is
+    None if the file was annotated successfully.
+    """
+    (pdb_path, out_dir) = job
+
+    try:
+        write_annotation(pdb_path, out_dir)
+    except Exception as e:
+        # the error report has one line per PDB file
+        return pdb_path, type(e).__name__ + ': ' + ' '.join(str(e).split())
+
+    return pdb_path, None
+
+
+def annotate_batch(pdb_files, out_dir, n_jobs):
+    """
+    Annotates all PDB files of a batch. The output files of each PDB file are
+    written as soon as it is annotated. A PDB file that cannot be annotated
+    is reported, but does not stop the batch.
+
+    :param pdb_files: Paths to the PDB files.
+    :param out_dir: Directory the output files are written to.
+    :param n_jobs: Number of worker processes.
+    :return: Generator of the path of each PDB file together with the error
+    message, which is None if the file was annotated successfully.
+    """
+    jobs = [(pdb_path, out_dir) for pdb_path in pdb_files]
+
+    if n_jobs > 1 and len(jobs) > 1:
+
+        # the workers are forked after the predictors have been loaded,
+        # so they do not have to load them again
+        pool = Pool(n_jobs)
+        try:
+            for result in pool.imap_unordered(_annotate_file, jobs):
+                yield result
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for job in jobs:
+            yield _annotate_file(job)
+
+
 def main(argv):
 
     # configure command-line parser for the annotation main
     parser = argparse.ArgumentParser(description=PARSER_DESCRIPTION)
 
     # Path of the PDB file that should be annotated
-    parser.add_argument('PDB', type=str, help="PDB file to be annotated.")
+    parser.add_argument('PDB', type=str, nargs='*',
+                        help="PDB file to be annotated. Several PDB files, "
+                             "directories or glob patterns annotate all "
+                             "PDB files they refer to as batch.")
 
     # In which directory the output file should be written to
     parser.add_argument('-o', type=str,
                         help="Where the output files should go to.",
                         default='out')
 
+    # Manifest file of a batch
+    parser.add_argument('-m', '--manifest', type=str,
+                        help="File that lists PDB files to be annotated, "
+                             "one per line.")
+
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of worker processes that annotate "
+                             "the PDB files of a batch.")
+
     # parse command-line arguments
     args = parser.parse_args(argv[1:])
 
+    if not args.PDB and args.manifest is None:
+        parser.error('No PDB file to be annotated.')
+
+    # a single PDB file is annotated as before, everything else is a batch
+    single = args.manifest is None and len(args.PDB) == 1 and \
+        not os.path.isdir(args.PDB[0]) and not glob.has_magic(args.PDB[0])
+
     # check whether PDB file actually exists. If not, then we must exit
-    if not os.path.isfile(args.PDB):
-        sys.stderr.write('No PDB file: ' + args.PDB)
+    if single and not os.path.isfile(args.PDB[0]):
+        sys.stderr.write('No PDB file: ' + args.PDB[0])
         sys.exit(1)
 
     # create output directory, if it does not yet exist
@@ -70,41 +228,39 @@ def main(argv):
     # load
     conf.load_predictors()
 
-    # get PDBID
-    pdbid = get_id(args.PDB)
-
-    # annotate given PDB file
-    (true_expand, pred_expand, true_sheets, pred_sheets) = annotate(args.PDB)
+    if single:
+        write_annotation(args.PDB[0], args.o)
+        return
 
-    with open(args.o + os.path.sep + pdbid + '_predicted', 'w') as f:
+    pdb_files, missing = collect_pdb_files(args.PDB, args.manifest)
 
-        for (pos, cls) in pred_expand.items():
+    failed = 0
 
-            sheet_id, orient = strand_annotate(pos, pred_sheets)
+    # errors are reported as soon as they occur
+    with open(args.o + os.path.sep + 'errors', 'w') as report:
 
-            f.write('\t'.join(map(str, [pos,cls,Q3_MAPPING[cls],
-                                        TYPE_MAPPING[cls], sheet_id, orient]))
-                    + os.linesep)
+        for source in missing:
+            report.write(source + '\tNo PDB file' + os.linesep)
+            report.flush()
+            failed += 1
 
-    with open(args.o + os.path.sep + pdbid + '_true', 'w') as f:
-        for (pos, cls) in true_expand.items():
+        for (pdb_path, error) in annotate_batch(pdb_files, args.o,
+                                                args.jobs):
+            if error is not None:
+                report.write(pdb_path + '\t' + error + os.linesep)
+                report.flush()
+                failed += 1
 
-            sheet_id, orient = strand_annotate(pos, true_sheets)
+    sys.stdout.write('Annotated ' + str(len(pdb_files) + len(missing) -
+                                        failed) + ' of ' +
+                     str(len(pdb_files) + len(missing)) + ' PDB files.' +
+                     os.linesep)
 
-            f.write('\t'.join(map(str, [pos,cls,Q3_MAPPING[cls],
-                                        TYPE_MAPPING[cls],sheet_id,orient]))
-                    + os.linesep)
+    if failed:
+        sys.stderr.write(str(failed) + ' PDB files could not be annotated, '
+                         'see ' + args.o + os.path.sep + 'errors' +
+                         os.linesep)
+        sys.exit(4)
 
 if __name__ == '__main__':
     main(sys.argv)
-
-
-
-
-
-
-
-
-
-
-
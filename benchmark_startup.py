@@ -0,0 +1,78 @@
+"""
+Measures how long it takes to import the scripts of this project in a fresh
+interpreter, and which of the expensive libraries they import.
+"""
+import sys
+import argparse
+import os
+import subprocess
+
+import numpy as np
+
+PARSER_DESC = ("Measures the time needed to import the scripts of this "
+               "project in a fresh interpreter.")
+
+# Libraries whose import takes a considerable amount of time
+HEAVY_MODULES = ['sklearn', 'sklearn.ensemble', 'scipy', 'scipy.optimize',
+                 'scipy.spatial', 'Bio.PDB']
+
+# Imports the module and prints the import time and the heavy modules
+PROBE = ("import sys, time\n"
+         "start = time.time()\n"
+         "import {module}\n"
+         "end = time.time()\n"
+         "sys.stdout.write(repr(end - start) + ' ' + ' '.join(\n"
+         "    m for m in {heavy!r} if m in sys.modules))\n")
+
+
+def measure(module, repeat):
+    """
+    Imports `module` in `repeat` fresh interpreters.
+
+    :param module: Name of the module to be imported.
+    :param repeat: Number of imports.
+    :return: List of the import times in seconds and list of the heavy
+    modules that have been imported.
+    """
+    times = []
+    heavy = []
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    for _ in xrange(repeat):
+
+        output = subprocess.check_output(
+            [sys.executable, '-c', PROBE.format(module=module,
+                                                heavy=HEAVY_MODULES)],
+            cwd=directory)
+
+        fields = output.split()
+        times.append(float(fields[0]))
+        heavy = fields[1:]
+
+    return times, heavy
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(description=PARSER_DESC)
+    parser.add_argument('MODULES', type=str, nargs='*',
+                        default=['annotate', 'serve', 'create_predictors',
+                                 'evaluate'],
+                        help="Modules to be imported.")
+    parser.add_argument('-n', type=int, default=5,
+                        help="Number of imports of each module.")
+
+    args = parser.parse_args(argv[1:])
+
+    for module in args.MODULES:
+
+        times, heavy = measure(module, args.n)
+
+        sys.stdout.write('\t'.join([module,
+                                    'min ' + '%.3f' % np.min(times),
+                                    'mean ' + '%.3f' % np.mean(times),
+                                    ','.join(heavy) or '-']) + os.linesep)
+
+if __name__ == '__main__':
+    main(sys.argv)
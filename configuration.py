@@ -2,15 +2,27 @@
 This is the central configuration file. You can set important subdirectories
 and meta parameters here.
 """
-from sklearn.ensemble import RandomForestClassifier
+
 
 #############################################################################
 # If you want to train new predictors, declare them here.
-# You can use all predictors from scikit-learn.
+# You can use all predictors from scikit-learn. Each function returns a new,
+# unfitted predictor. Import scikit-learn within the functions, such that
+# it is only imported when new predictors are trained.
 ##############################################################################
-helix_predictor = RandomForestClassifier(n_estimators=20)
-strand_predictor = RandomForestClassifier(n_estimators=20)
-sheet_predicor = RandomForestClassifier(n_estimators=20)
+def helix_predictor():
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=20)
+
+
+def strand_predictor():
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=20)
+
+
+def sheet_predicor():
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=20)
 
 # The Window size to be used for Helices
 helix_window_size = 5
@@ -21,6 +33,24 @@ strand_window_size = 3
 # Directory for caching features
 temp_dir = 'temp'
 
+# Whether encoded windows should be kept in the feature store in the
+# directory for caching features, such that they are only computed once
+use_feature_store = True
+
+# Maximal size (in bytes of the PDB files) of all parsed structures that are
+# kept in memory
+structure_cache_size = 256 * 1024 * 1024
+
+# Maximal number of feature contexts (Hydrogen Bonds, torsion angles of a
+# PDB file) that are kept in memory
+context_cache_size = 256
+
+# Number of worker processes that extract the features of the PDB files
+n_jobs = 1
+
+# Number of PDB files that are handed to a worker process at once
+chunk_size = 4
+
 # Where the trained predictors should be pickled to
 pred_dir = 'predictors'
 
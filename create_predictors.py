@@ -2,6 +2,7 @@
 This file is used to create new Prediction Models that will then be loaded
 into the annotate.py Script.
 """
+from __future__ import division
 import sys
 import argparse
 import os
@@ -9,55 +10,144 @@ import cPickle
 
 from src.util import absolute_file_paths
 from src.conf import conf
-from feature_list import helix_features, strand_features, sheet_features
 from src.learn.FeatureContext import FeatureContext
+from src.learn.binary_cache import file_digest
+from src.learn.training import PREDICTORS, training_matrix, fit_predictors,\
+    read_manifest, write_manifest, trained_files, added_trees, \
+    update_predictor
 
 PARSER_DESC = ("Accepts a PDB file and creates Predictors based on "
                "the parameters set in configuration.py and feature_list.py")
 
+
 def main(argv):
 
     parser = argparse.ArgumentParser(description=PARSER_DESC)
     parser.add_argument('PDB_FILES', type=str)
+    parser.add_argument('-j', '--jobs', type=int,
+                        help="Number of cores for feature extraction and "
+                             "the fits of the predictors.")
+    parser.add_argument('-i', '--incremental', action='store_true',
+                        help="Update the existing predictors with the PDB "
+                             "files they have not been trained with yet.")
+    parser.add_argument('-t', '--trees', type=int,
+                        help="Number of trees to add to ensemble predictors "
+                             "in incremental mode. By default proportional "
+                             "to the number of new PDB files.")
 
     args = parser.parse_args(argv[1:])
-    conf.reset_predictors()
     conf.set_dir('.')
 
-    pdb_files = absolute_file_paths(args.PDB_FILES)
+    if args.jobs is not None:
+        conf.n_jobs = args.jobs
+
+    pdb_files = list(absolute_file_paths(args.PDB_FILES))
+
+    # PDB files are identified by their content, so moved or renamed
+    # PDB files are not learned again
+    digests = {pdb: file_digest(pdb) for pdb in pdb_files}
+
+    seen = read_manifest(conf.pred_dir) if args.incremental else None
+
+    if seen is None:
+
+        # train all predictors from scratch
+        predictors = dict(zip(PREDICTORS, conf.new_predictors()))
+        new_files = pdb_files
+        seen = {}
+        refit = PREDICTORS
+    else:
+
+        conf.load_predictors()
+        predictors = dict(zip(PREDICTORS, [conf.helix_predictor,
+                                           conf.strand_predictor,
+                                           conf.sheet_predictor]))
+        new_files = [pdb for pdb in pdb_files if digests[pdb] not in seen]
+
+        if not new_files:
+            sys.stdout.write('The predictors have been trained with all PDB '
+                             'files already.' + os.linesep)
+            return
+
+        sys.stdout.write('Updating the predictors with ' +
+                         str(len(new_files)) + ' new PDB files.' + os.linesep)
+
+        # only the new PDB files are encoded, unless a predictor has to be
+        # fitted to the former and the new PDB files again
+        fc = FeatureContext(new_files)
+        refit = []
+
+        for name in PREDICTORS:
 
-    # Get Feature table of Training data
-    fc = FeatureContext(pdb_files)
+            x_train, y_train = training_matrix(fc, name)
+            predictor = predictors[name]
 
-    # train Helix Predictor
-    sys.stdout.write('Started to fit the HELIX predictor.' + os.linesep)
-    x_train, y_train = fc.construct_window_matrix(helix_features,
-                                                  conf.helix_assigner,
-                                                  conf.helix_window_size)
-    conf.helix_predictor.fit(x_train, y_train)
+            n_trees = args.trees
+            if n_trees is None and hasattr(predictor, 'estimators_'):
+                n_trees = added_trees(predictor,
+                                      len(new_files) / max(1, len(seen)))
 
-    # train Strand Predictor
-    sys.stdout.write('Started to fit the STRAND predictor.' + os.linesep)
-    x_train, y_train = fc.construct_window_matrix(strand_features,
-                                                  conf.strand_assigner,
-                                                  conf.strand_window_size)
-    conf.strand_predictor.fit(x_train, y_train)
+            if update_predictor(predictor, x_train, y_train, n_trees):
+                sys.stdout.write('Updated the ' + name + ' predictor.' +
+                                 os.linesep)
+                continue
 
-    # train Sheet Predictor
-    sys.stdout.write('Started to fit the SHEET predictor.' + os.linesep)
-    x_train, y_train = fc.construct_sheet_matrix(sheet_features)
-    conf.sheet_predictor.fit(x_train, y_train)
+            sys.stdout.write('The ' + name + ' predictor cannot be updated, '
+                             'it is fitted to all PDB files.' + os.linesep)
+
+            predictors[name] = \
+                conf.new_predictors()[PREDICTORS.index(name)]
+            refit.append(name)
+
+        # the training data of the new PDB files is not needed anymore
+        del x_train, y_train
+
+        if refit:
+
+            # predictors are only refitted to all PDB files of the manifest,
+            # otherwise the manifest would list PDB files they have not
+            # been trained with
+            former, missing = trained_files(seen, digests)
+
+            if missing:
+                sys.stderr.write('Cannot fit ' + ', '.join(refit) +
+                                 ' again, the following PDB files of the '
+                                 'manifest are missing or have changed: ' +
+                                 ', '.join(missing) + os.linesep)
+                sys.exit(5)
+
+            pdb_files = former + new_files
+
+    if refit:
+
+        sys.stdout.write('Started to fit ' + ', '.join(refit) + '.' +
+                         os.linesep)
+
+        # the predictors are fitted concurrently, each by its own process
+        for (name, predictor) in fit_predictors(pdb_files,
+                                                {name: predictors[name]
+                                                 for name in refit},
+                                                conf.n_jobs):
+            sys.stdout.write('Fitted the ' + name + ' predictor.' +
+                             os.linesep)
+            predictors[name] = predictor
+
+    (conf.helix_predictor, conf.strand_predictor,
+     conf.sheet_predictor) = [predictors[name] for name in PREDICTORS]
 
     # create output directory for predictor if it does not exist
     if not os.path.exists(conf.pred_dir):
         os.makedirs(conf.pred_dir)
 
-    with open(conf.pred_dir + os.path.sep + 'HELIX', 'w') as f:
-        cPickle.dump(conf.helix_predictor, f)
-    with open(conf.pred_dir + os.path.sep + 'STRAND', 'w') as f:
-        cPickle.dump(conf.helix_predictor, f)
-    with open(conf.pred_dir + os.path.sep + 'SHEET', 'w') as f:
-        cPickle.dump(conf.helix_predictor, f)
+    for name in PREDICTORS:
+        with open(conf.pred_dir + os.path.sep + name, 'w') as f:
+            cPickle.dump(predictors[name], f)
+
+    # the manifest is written last, such that it never lists PDB files the
+    # pickled predictors have not been trained with
+    manifest = dict(seen)
+    manifest.update({digests[pdb]: pdb for pdb in new_files})
+    write_manifest(conf.pred_dir, manifest)
 
 if __name__ == '__main__':
-    main(sys.argv)
\ No newline at end of file
+    main(sys.argv)
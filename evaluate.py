@@ -20,12 +20,21 @@ def main(args):
     parser.add_argument('PDB_FILES', type=str)
     parser.add_argument('-f', '--fold', type=int)
     parser.add_argument('-m', type=str, default='Q3')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help="Number of worker processes for feature "
+                             "extraction and for the evaluation of folds.")
+    parser.add_argument('-s', '--seed', type=int, default=0,
+                        help="Base seed of the predictors, the predictors of "
+                             "fold i are seeded with SEED + i.")
 
     args = parser.parse_args(args[1:])
 
     # set working directory of central configuration
     conf.set_dir('.')
 
+    if args.jobs is not None:
+        conf.n_jobs = args.jobs
+
     pdb_files = list(absolute_file_paths(args.PDB_FILES))
 
     # determine how many folds should be used.
@@ -48,10 +57,14 @@ def main(args):
     sovs = []
 
     # compute all folds
-    for acc, sov, in cv_annotator(folds, mode=args.m):
+    for acc, sov, in cv_annotator(folds, mode=args.m,
+                                    random_state=args.seed):
         accs.append(acc)
         sovs.append(sov)
 
+        sys.stdout.write('Fold ' + str(len(accs)) + ': ACC ' + str(acc) +
+                         ' SOV ' + str(sov) + os.linesep)
+
     # write all results in files
     with open(conf.eval_dir + os.path.sep + 'accuracies', 'w') as f:
         for acc in accs:
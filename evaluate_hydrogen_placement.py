@@ -0,0 +1,65 @@
+"""
+Compares the backbone hydrogens placed in closed form with the hydrogens
+placed by the SLSQP optimization for all PDB files in a directory.
+"""
+import sys
+import argparse
+import os
+
+import numpy as np
+
+from src.util import absolute_file_paths
+from src.conf import conf
+from src.pdb.hydrogen import compare_placement
+from src.pdb.constants import HNCA_ANGLE_DEG
+
+PARSER_DESC = ("Compares the backbone hydrogens placed in closed form "
+               "with the hydrogens placed by SLSQP optimization.")
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(description=PARSER_DESC)
+    parser.add_argument('PDB_FILES', type=str)
+    parser.add_argument('-o', type=str,
+                        help="File the comparison should be written to.",
+                        default='hydrogen_placement.tsv')
+
+    args = parser.parse_args(argv[1:])
+
+    all_distances = []
+
+    with open(args.o, 'w') as f:
+
+        f.write('\t'.join(['PDB', 'n', 'mean_dist', 'max_dist',
+                           'max_angle_dev_analytic',
+                           'max_angle_dev_optimize']) + os.linesep)
+
+        for pdb_file in sorted(absolute_file_paths(args.PDB_FILES)):
+
+            # the structure is only read, so the cached backbone can be used
+            distances, angles_analytic, angles_optimize = \
+                compare_placement(conf.structure_cache.get_backbone(pdb_file))
+
+            if not len(distances):
+                continue
+
+            all_distances.append(distances)
+
+            f.write('\t'.join(map(str, [
+                os.path.basename(pdb_file), len(distances),
+                np.mean(distances), np.max(distances),
+                np.max(np.abs(angles_analytic - HNCA_ANGLE_DEG)),
+                np.max(np.abs(angles_optimize - HNCA_ANGLE_DEG))]))
+                + os.linesep)
+
+    if all_distances:
+        distances = np.concatenate(all_distances)
+        sys.stdout.write('Hydrogens: ' + str(len(distances)) + os.linesep)
+        sys.stdout.write('Mean distance: ' + str(np.mean(distances)) +
+                         os.linesep)
+        sys.stdout.write('Max distance: ' + str(np.max(distances)) +
+                         os.linesep)
+
+if __name__ == '__main__':
+    main(sys.argv)
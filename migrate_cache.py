@@ -0,0 +1,128 @@
+"""
+Converts the Hydrogen Bond caches of former versions (.hbc pickles and plain
+.hb files) in the temp directory to the binary cache format. The converted
+.hbc pickles are removed, the plain .hb files are kept, as they are read by
+the PatternAnnotator and the R scripts. Torsion angle caches (.ta) are no
+longer used and are removed as well.
+
+The former caches do not record which PDB file they have been computed from,
+so they are assumed to belong to the PDB files that are given now. Remove
+the temp directory instead if this is not the case.
+"""
+import sys
+import argparse
+import os
+import re
+import cPickle
+
+from src.util import absolute_file_paths, get_id
+from src.conf import conf
+from src.pdb.constants import RE_WHITESPACE
+from src.learn.HydrogenBondMatrix import arrays_from_map
+
+PARSER_DESC = ("Converts the Hydrogen Bond caches of former versions in the "
+               "temp directory to the current cache format.")
+
+
+def read_legacy_map(temp_dir, pdbid):
+    """
+    Reads the former Hydrogen Bond cache of a PDB file. The .hbc pickle is
+    preferred over the plain .hb file.
+
+    :return: Potential map and the path of the file it has been read from,
+    or (None, None) if there is no usable former cache.
+    """
+    hbc_path = temp_dir + os.path.sep + pdbid + '.hbc'
+    hb_path = temp_dir + os.path.sep + pdbid + '.hb'
+
+    if os.path.exists(hbc_path):
+
+        with open(hbc_path, 'r') as f:
+            try:
+                potential_map = cPickle.load(f)
+            except Exception:
+                potential_map = None
+
+        # some former versions used Residue objects as keys, which cannot
+        # be converted
+        if potential_map is not None and \
+                all(isinstance(pos, int) for pair in potential_map
+                    for pos in pair):
+            return potential_map, hbc_path
+
+    if os.path.exists(hb_path):
+
+        with open(hb_path, 'r') as f:
+            try:
+                return {(int(splt[0]), int(splt[1])): (float(splt[2]),
+                                                       float(splt[3]))
+                        for splt in (re.split(RE_WHITESPACE, line.strip())
+                                     for line in f if line.strip())}, hb_path
+
+            # plain files written with Residue objects as keys
+            except (ValueError, IndexError):
+                return None, None
+
+    return None, None
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(description=PARSER_DESC)
+    parser.add_argument('PDB_FILES', type=str,
+                        help="Directory of the PDB files the caches belong "
+                             "to.")
+    parser.add_argument('-d', '--min-seq-distance', type=int, default=2,
+                        help="Minimal sequence distance the Hydrogen Bonds "
+                             "have been computed with.")
+
+    args = parser.parse_args(argv[1:])
+
+    # sets the working directory in the central configuration to
+    # the directory where the script was executed
+    conf.set_dir('.')
+
+    migrated = 0
+    removed = 0
+
+    for pdb_path in absolute_file_paths(args.PDB_FILES):
+
+        pdbid = get_id(pdb_path)
+
+        if pdbid is None:
+            continue
+
+        obsolete = [conf.temp_dir + os.path.sep + pdbid + '.ta']
+
+        # valid cache files are not replaced by the plain .hb files, which
+        # are written along with them
+        if conf.hb_cache.get(pdb_path, args.min_seq_distance) is None:
+            potential_map, source = read_legacy_map(conf.temp_dir, pdbid)
+        else:
+            potential_map, source = None, None
+
+        if potential_map is not None:
+
+            pairs, energies = arrays_from_map(potential_map)
+
+            conf.hb_cache.put(pdb_path, args.min_seq_distance, pairs,
+                              energies)
+            migrated += 1
+
+            # only a pickle that has been converted is removed, the plain
+            # .hb files are still read by the PatternAnnotator
+            if source.endswith('.hbc'):
+                obsolete.append(source)
+
+        for path in obsolete:
+
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+
+    sys.stdout.write('Migrated ' + str(migrated) + ' Hydrogen Bond caches, '
+                     'removed ' + str(removed) + ' former cache files.' +
+                     os.linesep)
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,309 @@
+"""
+Runs a local annotation server. The predictors are loaded and all modules
+are imported once, so annotating a PDB file only costs the annotation
+itself. The PDB files are annotated by worker processes, which keep their
+structure and feature caches across requests.
+
+The server accepts the following requests:
+
+GET /health
+    Reports the number of requests that are currently pending.
+
+POST /annotate?path=PATH
+    Annotates the PDB file at PATH, which must lie within the PDB directory
+    of the server (-d). Relative paths are relative to this directory. If
+    the server has no PDB directory, only uploaded PDB files are annotated.
+
+POST /annotate?id=PDBID
+    Annotates the PDB file sent as request body. The PDBID is taken from
+    the HEADER record if it is not given.
+
+The annotation is returned as JSON object with the rows of the predicted and
+the true annotation, which are the lines of the files written by
+annotate.py.
+"""
+import sys
+import argparse
+import os
+import json
+import shutil
+import tempfile
+import threading
+import urlparse
+from multiprocessing import Pool
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn, UnixStreamServer
+
+from src.conf import conf
+from src.util import get_id
+from annotate import annotation_rows
+
+PARSER_DESC = ("Runs a local server that annotates PDB files with the "
+               "predictors in the predictor directory.")
+
+
+def _annotate(pdb_path):
+    """
+    Annotates a PDB file within a worker process.
+
+    :return: 2-tuple (rows, error), where error is None if the file was
+    annotated successfully.
+    """
+    try:
+        return annotation_rows(pdb_path), None
+    except Exception as e:
+        return None, type(e).__name__ + ': ' + ' '.join(str(e).split())
+
+
+def _to_json(value):
+
+    # Numpy scalars, such as predicted classes
+    if hasattr(value, 'item'):
+        return value.item()
+
+    return str(value)
+
+
+class AnnotationHandler(BaseHTTPRequestHandler):
+    """
+    Handles the requests of a single client connection.
+    """
+
+    def log_message(self, format, *args):
+
+        # clients of Unix sockets do not have an address
+        client = self.client_address[0] if self.client_address else 'local'
+
+        sys.stderr.write(client + ' - - [' + self.log_date_time_string() +
+                         '] ' + (format % args) + os.linesep)
+
+    def _respond(self, code, body):
+
+        content = json.dumps(body, default=_to_json)
+
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+
+        if urlparse.urlparse(self.path).path != '/health':
+            self._respond(404, {'error': 'Unknown resource ' + self.path})
+            return
+
+        self._respond(200, {'status': 'ok',
+                            'pending': self.server.pending,
+                            'max_pending': self.server.max_pending})
+
+    def do_POST(self):
+
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query)
+
+        if url.path != '/annotate':
+            self._respond(404, {'error': 'Unknown resource ' + self.path})
+            return
+
+        length = int(self.headers.getheader('Content-Length') or 0)
+        content = self.rfile.read(length) if length else None
+
+        # reject requests that would exceed the bounded queue
+        if not self.server.slots.acquire(False):
+            self._respond(503, {'error': 'Too many pending requests'})
+            return
+
+        upload_dir = None
+
+        try:
+            self.server.count(1)
+
+            if 'path' in query:
+                pdb_path = _resolve(self.server.pdb_dir, query['path'][0])
+
+                if pdb_path is None:
+                    self._respond(403, {'error': 'Path outside of the PDB '
+                                                 'directory: ' +
+                                                 query['path'][0]})
+                    return
+
+                if not os.path.isfile(pdb_path):
+                    self._respond(404, {'error': 'No PDB file: ' +
+                                                 query['path'][0]})
+                    return
+
+            elif content:
+                pdbid = query['id'][0] if 'id' in query \
+                    else _header_id(content)
+
+                if pdbid is None or get_id(pdbid) != pdbid:
+                    self._respond(400, {'error': 'No valid PDBID given'})
+                    return
+
+                # the PDBID of a PDB file is determined by its file name
+                upload_dir = tempfile.mkdtemp(prefix='upload')
+                pdb_path = upload_dir + os.path.sep + pdbid + '.pdb'
+
+                with open(pdb_path, 'w') as f:
+                    f.write(content)
+            else:
+                self._respond(400, {'error': 'Neither path nor content of '
+                                             'a PDB file given'})
+                return
+
+            rows, error = self.server.pool.apply(_annotate, (pdb_path,))
+
+            if error is not None:
+                self._respond(422, {'pdb': get_id(pdb_path), 'error': error})
+            else:
+                self._respond(200, {'pdb': get_id(pdb_path),
+                                    'predicted': rows[0],
+                                    'true': rows[1]})
+        finally:
+            self.server.count(-1)
+            self.server.slots.release()
+
+            if upload_dir is not None:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+
+
+class _AnnotationServer(ThreadingMixIn):
+    """
+    Server that serves each connection in its own thread, while the
+    annotation itself is done by the pool of worker processes.
+    """
+    daemon_threads = True
+
+    def setup_annotation(self, pool, max_pending, pdb_dir=None):
+        """
+        :param pool: Pool of worker processes that annotate the PDB files.
+        :param max_pending: Maximal number of requests that are annotated or
+        wait for a worker process at once.
+        :param pdb_dir: Directory of the PDB files that may be annotated by
+        their path, or None if only uploaded PDB files are annotated.
+        """
+        self.pool = pool
+        self.max_pending = max_pending
+        self.pdb_dir = None if pdb_dir is None else os.path.realpath(pdb_dir)
+        self.pending = 0
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+    def count(self, delta):
+
+        with self._lock:
+            self.pending += delta
+
+
+class TCPAnnotationServer(_AnnotationServer, HTTPServer):
+    pass
+
+
+class UnixAnnotationServer(_AnnotationServer, UnixStreamServer):
+
+    # required by BaseHTTPRequestHandler
+    server_name = 'localhost'
+    server_port = 0
+
+
+def _resolve(pdb_dir, path):
+    """
+    Resolves the path of a PDB file of a request, including symbolic links,
+    and checks that it lies within the PDB directory.
+
+    :param pdb_dir: Resolved PDB directory of the server, or None.
+    :param path: Path as given by the request, relative paths are relative
+    to the PDB directory.
+    :return: Resolved path, or None if the path is outside of the PDB
+    directory or the server has no PDB directory.
+    """
+    if pdb_dir is None:
+        return None
+
+    resolved = os.path.realpath(os.path.join(pdb_dir, path))
+
+    if not resolved.startswith(os.path.join(pdb_dir, '')):
+        return None
+
+    return resolved
+
+
+def _header_id(content):
+    """
+    Extracts the PDBID from the HEADER record of the content of a PDB file.
+    """
+    for line in content.splitlines():
+
+        if line.startswith('HEADER'):
+
+            pdbid = line[62:66].strip()
+            return pdbid if pdbid else None
+
+    return None
+
+
+def main(argv):
+
+    parser = argparse.ArgumentParser(description=PARSER_DESC)
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help="Host the server is bound to.")
+    parser.add_argument('-p', '--port', type=int, default=8377,
+                        help="Port the server is bound to.")
+    parser.add_argument('-s', '--socket', type=str,
+                        help="Path of a Unix socket the server is bound to, "
+                             "instead of host and port.")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of worker processes, which is the "
+                             "maximal number of concurrent annotations.")
+    parser.add_argument('-q', '--queue', type=int, default=16,
+                        help="Maximal number of pending requests, further "
+                             "requests are rejected.")
+    parser.add_argument('-d', '--pdb-dir', type=str,
+                        help="Directory of the PDB files that may be "
+                             "annotated by their path. Without it, only "
+                             "uploaded PDB files are annotated.")
+
+    args = parser.parse_args(argv[1:])
+
+    # sets the working directory in the central configuration to
+    # the directory where the script was executed
+    conf.set_dir('.')
+
+    # load
+    conf.load_predictors()
+
+    # the workers are forked after the predictors have been loaded
+    pool = Pool(args.jobs)
+
+    if args.socket is not None:
+
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+        server = UnixAnnotationServer(args.socket, AnnotationHandler)
+        address = args.socket
+    else:
+        server = TCPAnnotationServer((args.host, args.port),
+                                     AnnotationHandler)
+        address = args.host + ':' + str(server.server_port)
+
+    server.setup_annotation(pool, max(args.queue, args.jobs), args.pdb_dir)
+
+    sys.stdout.write('Serving annotations on ' + address + os.linesep)
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.terminate()
+        pool.join()
+
+        if args.socket is not None and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+if __name__ == '__main__':
+    main(sys.argv)
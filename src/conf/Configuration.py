@@ -1,13 +1,17 @@
 import cPickle
 import os
 import sys
-import copy
 
-from src.util import pdb_map
 from src.learn.ClassAssigner import ClassAssigner
 from src.learn.target_encoding import TARGET_CODES
+from src.pdb.cache import StructureCache
+from src.learn.FeatureStore import FeatureStore
+from src.learn.HydrogenBondCache import HydrogenBondCache
+from src.learn.ContextCache import ContextCache
 from configuration import helix_predictor, strand_predictor, sheet_predicor,\
-    helix_window_size, strand_window_size, temp_dir, pred_dir, eval_dir
+    helix_window_size, strand_window_size, temp_dir, pred_dir, eval_dir,\
+    structure_cache_size, context_cache_size, n_jobs, chunk_size,\
+    use_feature_store
 
 
 class Configuration(object):
@@ -17,11 +21,21 @@ class Configuration(object):
         self.helix_window_size = helix_window_size
         self.strand_window_size = strand_window_size
 
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+
         self.path = None
         self.temp_dir = None
         self.pred_dir = None
         self.eval_dir = None
-        self.hb_dict = None
+        self.hb_cache = None
+        self.feature_store = None
+
+        # parsed structures shared by all components of this process
+        self.structure_cache = StructureCache(structure_cache_size)
+
+        # contexts of the features, shared by all feature instances
+        self.context_cache = ContextCache(context_cache_size)
 
         self.helix_assigner = ClassAssigner([TARGET_CODES['Coil'],
                                              TARGET_CODES['Alpha-Helix'],
@@ -61,15 +75,28 @@ class Configuration(object):
         with open(self.pred_dir + os.path.sep + 'SHEET', 'r') as f:
             self.sheet_predictor = cPickle.load(f)
 
+    def new_predictors(self):
+        """
+        Returns new, unfitted copies of the predictors declared in
+        configuration.py, without changing the predictors of this
+        configuration.
+
+        :return: 3-tuple of the Helix, Strand and Sheet predictor
+        """
+        return helix_predictor(), strand_predictor(), sheet_predicor()
+
     def reset_predictors(self):
-        self.helix_predictor = copy.copy(helix_predictor)
-        self.strand_predictor = copy.copy(strand_predictor)
-        self.sheet_predictor = copy.copy(sheet_predicor)
+        (self.helix_predictor, self.strand_predictor,
+         self.sheet_predictor) = self.new_predictors()
 
     def set_dir(self, path):
         self.path = path
         self.temp_dir = path + os.path.sep + temp_dir
         self.pred_dir = path + os.path.sep + pred_dir
         self.eval_dir = path + os.path.sep + eval_dir
-        self.hb_dict = pdb_map(self.temp_dir)
+        self.hb_cache = HydrogenBondCache(self.temp_dir)
+
+        if use_feature_store:
+            self.feature_store = FeatureStore(self.temp_dir + os.path.sep +
+                                              'features')
 
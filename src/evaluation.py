@@ -1,5 +1,6 @@
 from __future__ import division
 from math import floor
+from multiprocessing import Pool
 
 from sklearn.metrics import accuracy_score
 import numpy as np
@@ -7,6 +8,7 @@ import numpy as np
 from src.learn import base
 from learn.FeatureContext import FeatureContext
 from src.conf import conf
+from src.util import ForkPayload
 from feature_list import helix_features, strand_features
 from src.learn.target_encoding import Q3_MAPPING, HELIX_MAPPING, STRAND_MAPPING
 
@@ -141,63 +143,161 @@ def eval_pdb(test_pdb):
 
     return acc
 
-def cv_annotator(folds, mode='Q3'):
+def cv_annotator(folds, mode='Q3', n_jobs=None, random_state=0):
     """
     Evaluates annotation in a CV manner by training predictors on the
     test set and annotating all remaining PDB files with their
     secondary structure and evaluating on the remaining PDB files.
 
-    :return: List of Accuracies
+    The windows of each PDB file are only encoded once, the matrices of
+    the folds are assembled from the rows of their PDB files. The folds can
+    be evaluated by several worker processes, each of which fits its own
+    predictors.
+
+    :param n_jobs: Number of worker processes that evaluate the folds.
+    Defaults to the central configuration.
+    :param random_state: Base seed of the predictors. The predictors of fold
+    i are seeded with random_state + i, so the results do not depend on the
+    number of worker processes or on the random state they inherit.
+    :return: Generator of the mean ACC and SOV of each fold, in the order
+    of the folds.
     """
-    # consider each fold of the CV
-    for (train, test) in folds:
+    if n_jobs is None:
+        n_jobs = conf.n_jobs
 
-        conf.reset_predictors()
+    if mode == 'Q3':
+        mapping = Q3_MAPPING
+        symbols = ['H', 'E', '-']
 
-        # Fit predictors on training data
-        fc = FeatureContext(train)
+    elif mode == 'H':
+        mapping = HELIX_MAPPING
+        symbols = ['H', '-']
 
-        if mode == 'Q3':
-            mapping = Q3_MAPPING
-            symbols = ['H', 'E', '-']
+    elif mode == 'E':
+        mapping = STRAND_MAPPING
+        symbols = ['E', '-']
 
-        elif mode == 'H':
-            mapping = HELIX_MAPPING
-            symbols = ['H', '-']
+    # all PDB files that occur in any fold
+    pdb_files = sorted(set(pdb for (train, test) in folds
+                           for pdb in train + test))
 
-        elif mode == 'E':
-            mapping = STRAND_MAPPING
-            symbols = ['E', '-']
+    fc = FeatureContext(pdb_files)
 
-        x_train, y_train = fc.construct_window_matrix(helix_features,
-                                                      conf.helix_assigner,
-                                                      conf.helix_window_size)
+    helix_windows = fc.construct_window_blocks(helix_features,
+                                               conf.helix_assigner,
+                                               conf.helix_window_size)
 
-        conf.helix_predictor.fit(x_train, y_train)
+    strand_windows = fc.construct_window_blocks(strand_features,
+                                                conf.strand_assigner,
+                                                conf.strand_window_size)
 
-        x_train, y_train = fc.construct_window_matrix(strand_features,
-                                                      conf.strand_assigner,
-                                                      conf.strand_window_size)
+    args = (helix_windows, strand_windows, mapping, symbols)
 
-        conf.strand_predictor.fit(x_train, y_train)
+    if n_jobs > 1 and len(folds) > 1:
 
-        acc = []
-        sov = []
+        with _cv.set(args):
+            pool = Pool(n_jobs)
 
-        # take average score of test set
-        for test_pdb in test:
+        try:
+            # results are returned in the order of the folds, regardless
+            # of which worker finishes first
+            for result in pool.imap(_run_fold,
+                                    [(fold, random_state + i)
+                                     for (i, fold) in enumerate(folds)]):
+                yield result
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for (i, fold) in enumerate(folds):
+            yield evaluate_fold(fold, *args, random_state=random_state + i)
 
-            map_true, map_predict = base.annotate_no_sheet(test_pdb)
 
-            # skip PDB file if we cannot annotate anything
-            if map_true is None:
-                continue
+def evaluate_fold(fold, helix_windows, strand_windows, mapping, symbols,
+                  random_state=None):
+    """
+    Fits new predictors on the training data of a fold and evaluates them
+    on its test data. The predictors of the central configuration are
+    neither used nor changed.
+
+    :param fold: Tuple of the training and the test PDB files.
+    :param helix_windows: Encoded helix windows of all PDB files, see
+    `FeatureContext.construct_window_blocks`
+    :param strand_windows: Encoded strand windows of all PDB files.
+    :param mapping: Maps the classes to the symbols to be evaluated.
+    :param symbols: Symbols whose segments are compared by the SOV.
+    :param random_state: Seed of the predictors, if they have the parameter
+    `random_state`.
+    :return: Mean ACC and mean SOV of the test PDB files of the fold.
+    """
+    (train, test) = fold
+
+    helix_predictor, strand_predictor, _ = conf.new_predictors()
+
+    # the seed of the fold is set explicitly, as forked worker processes
+    # inherit the random state of the parent process
+    if random_state is not None:
+        for predictor in (helix_predictor, strand_predictor):
+            if 'random_state' in predictor.get_params():
+                predictor.set_params(random_state=random_state)
+
+    # Fit predictors on training data
+    x_train, y_train = _stack(helix_windows, train)
+
+    helix_predictor.fit(x_train, y_train)
+
+    x_train, y_train = _stack(strand_windows, train)
+
+    strand_predictor.fit(x_train, y_train)
+
+    acc = []
+    sov = []
+
+    # take average score of test set
+    for test_pdb in test:
+
+        map_true, map_predict = base.annotate_windows(
+            helix_windows[test_pdb], strand_windows[test_pdb],
+            helix_predictor, strand_predictor)
+
+        # skip PDB file if we cannot annotate anything
+        if map_true is None:
+            continue
 
-            # map down to the Q3 score
-            map_true = map(lambda x: mapping[x], map_true.values())
-            map_predict = map(lambda x: mapping[x], map_predict.values())
+        # map down to the Q3 score
+        map_true = map(lambda x: mapping[x], map_true.values())
+        map_predict = map(lambda x: mapping[x], map_predict.values())
+
+        acc.append(accuracy_score(map_true, map_predict))
+        sov.append(segment_overlap(map_true, map_predict, symbols))
+
+    return np.mean(acc), np.mean(sov)
+
+
+# Encoded windows of the current cross-validation. The worker processes
+# inherit them when they are forked, so they do not have to be pickled.
+_cv = ForkPayload()
+
+
+def _run_fold(job):
+
+    (fold, random_state) = job
+    return evaluate_fold(fold, *_cv.get(), random_state=random_state)
+
+
+def _stack(windows, pdb_files):
+    """
+    Assembles the window matrix of `pdb_files` from the rows of the single
+    PDB files, in the order of `pdb_files`.
+
+    :param windows: Dictionary as returned by
+    `FeatureContext.construct_window_blocks`
+    :param pdb_files: PDB files whose rows should be used.
+    :return: X, Y as returned by `FeatureContext.construct_window_matrix`
+    """
+    blocks = [windows[pdb] for pdb in pdb_files]
 
-            acc.append(accuracy_score(map_true, map_predict))
-            sov.append(segment_overlap(map_true, map_predict, symbols))
+    X = np.concatenate([X for (_, X, _) in blocks])
+    Y = np.concatenate([Y for (_, _, Y) in blocks])
 
-        yield np.mean(acc), np.mean(sov),
+    return X, Y
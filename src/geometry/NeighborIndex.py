@@ -0,0 +1,54 @@
+"""
+Spatial index over points in 3D space, which allows to find all pairs of
+close points without considering all pairs of points.
+"""
+import numpy as np
+
+
+class NeighborIndex(object):
+    """
+    KD-tree over a set of points in 3D space. Points with missing (NaN)
+    coordinates are not indexed.
+    """
+
+    def __init__(self, points):
+        """
+        Builds the index over `points`.
+
+        :param points: Array of shape (n, 3) with the coordinates of the
+        points.
+        """
+        from scipy.spatial import cKDTree
+
+        points = np.asarray(points)
+
+        # indices of the points that are actually stored in the tree
+        self.indices = np.nonzero(np.all(np.isfinite(points), axis=1))[0]
+
+        if len(self.indices):
+            self._tree = cKDTree(points[self.indices])
+        else:
+            self._tree = None
+
+    def pairs(self, other, cutoff):
+        """
+        Finds all pairs of points of this and the `other` index whose
+        distance is at most `cutoff`.
+
+        :param other: NeighborIndex instance.
+        :param cutoff: Maximal distance of the points of a pair.
+        :return: 2-tuple of index arrays (i, j), where i refers to the points
+        of this index and j to the points of `other`.
+        """
+        if self._tree is None or other._tree is None:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+        neighbors = self._tree.query_ball_tree(other._tree, cutoff)
+
+        counts = [len(neighbor) for neighbor in neighbors]
+
+        if not sum(counts):
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+        return (np.repeat(self.indices, counts),
+                other.indices[np.concatenate(neighbors).astype(np.intp)])
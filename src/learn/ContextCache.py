@@ -0,0 +1,77 @@
+"""
+Process-wide cache for the contexts of features. Features compute their
+context (for instance the Hydrogen Bonds or the torsion angles of a PDB file)
+whenever they are told a new PDB file, which happens for each feature matrix
+and for each pair of strands that is encoded. The cache makes all but the
+first of these calls cheap.
+"""
+import os
+from collections import OrderedDict
+
+from src.learn.FeatureStore import feature_key
+
+
+class ContextCache(object):
+    """
+    Least recently used cache of the contexts of features.
+
+    Entries are keyed by the class and the parameters of the feature (see
+    `src.learn.FeatureStore.feature_key`) and by the absolute path and the
+    modification time of the PDB file. Thus, all instances of a
+    feature class with equal parameters share their contexts, and a PDB file
+    that changes on disk gets a new context.
+
+    Contexts returned by the cache are shared, so features must not modify
+    them.
+    """
+
+    def __init__(self, max_entries):
+        """
+        Creates new empty cache.
+
+        :param max_entries: Maximal number of contexts that are kept in
+        memory.
+        """
+        self.max_entries = max_entries
+
+        # maps (feature key, path, mtime) to the context, ordered by last
+        # access
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, feature, pdb_path, compute):
+        """
+        Returns the context of `feature` for the PDB file `pdb_path`. The
+        context is only computed if it is not cached yet.
+
+        :param feature: WindowFeature instance.
+        :param pdb_path: Path to the PDB file.
+        :param compute: Function which takes the path of the PDB file and
+        returns the context.
+        :return: Context of the feature.
+        """
+        path = os.path.abspath(pdb_path)
+        key = (feature_key(feature), path, os.stat(path).st_mtime)
+
+        if key in self._entries:
+
+            # reinsert entry to mark it as most recently used
+            context = self._entries.pop(key)
+            self._entries[key] = context
+            return context
+
+        context = compute(pdb_path)
+        self._entries[key] = context
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        return context
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        self._entries.clear()
@@ -1,12 +1,24 @@
 __author__ = 'lukas'
+from multiprocessing import Pool
 
-from Bio.PDB import PDBParser
+import numpy as np
 
-from src.pdb.extract import get_secondary_structure_annotation
-from src.util import get_id, window
+from src.util import window, ForkPayload
+from src.conf import conf
 from src.learn.WindowExtractor import WindowExtractor
 from sheets import sheet_encode
 
+# Block function and its arguments of the current parallel construction.
+# The worker processes inherit it when they are forked, so neither the
+# Feature Context nor the features have to be pickled.
+_job = ForkPayload()
+
+
+def _run_block(pdb):
+
+    (block, args) = _job.get()
+    return block(pdb, *args)
+
 
 class FeatureContext(object):
     """
@@ -14,13 +26,28 @@ class FeatureContext(object):
     used for encoding entities.
     """
 
-    def __init__(self, pdb_files):
+    def __init__(self, pdb_files, n_jobs=None, chunk_size=None):
+        """
+        :param pdb_files: Paths of all PDB files of this context.
+        :param n_jobs: Number of worker processes that encode the PDB files.
+        Defaults to the central configuration.
+        :param chunk_size: Number of PDB files that are handed to a worker
+        process at once. Defaults to the central configuration.
+        """
+        # the order of the PDB files determines the order of the rows
+        # of all feature matrices
+        self.pdb_files = list(pdb_files)
+
+        self.n_jobs = conf.n_jobs if n_jobs is None else n_jobs
+        self.chunk_size = conf.chunk_size if chunk_size is None \
+            else chunk_size
 
         # extract secondary structure annotations from all PDB files, so
-        # map each filepath to the secondary structures
+        # map each filepath to the secondary structures. The backbones are
+        # read in the same pass and kept in the structure cache.
         self.sec_struc = \
-            {pdb_file: get_secondary_structure_annotation(pdb_file)
-             for pdb_file in pdb_files}
+            {pdb_file: conf.structure_cache.read(pdb_file)[:3]
+             for pdb_file in self.pdb_files}
 
     def _update(self, pdb_path, features):
         """
@@ -32,6 +59,32 @@ class FeatureContext(object):
         for feature in features:
             feature.tell_context(pdb_path)
 
+    def _map(self, block, *args):
+        """
+        Applies `block` to each PDB file of this context, either sequentially
+        or with a pool of worker processes.
+
+        :param block: Function, which is called with the path of the PDB file
+        and `args` and returns the pair (X, Y) of the PDB file.
+        :return: Generator of the pairs (X, Y) of all PDB files, in the order
+        of the PDB files.
+        """
+        if self.n_jobs > 1 and len(self.pdb_files) > 1:
+
+            with _job.set((block, args)):
+                pool = Pool(self.n_jobs)
+
+            try:
+                for result in pool.imap(_run_block, self.pdb_files,
+                                        self.chunk_size):
+                    yield result
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for pdb in self.pdb_files:
+                yield block(pdb, *args)
+
     def construct_window_matrix(self, features, annotator, window_size):
         """
         Constructs feature matrix using the features and
@@ -41,62 +94,162 @@ class FeatureContext(object):
         feature module.
         :param annotator:
         :param window_size: Window size to be used to encode the features with.
-        :return: X,Y, where X encodes an entity per row with columns
-        representing the features to be used.
+        :return: X,Y, where X is a float32 matrix that encodes an entity per
+        row with columns representing the features to be used and Y is an
+        int8 vector of the classes of the entities.
         """
+        width = _width(features, window_size)
 
-        X = []
-        Y = []
+        # each PDB file has at most one window per residue
+        n = sum(_max_windows(pdb, window_size) for pdb in self.pdb_files)
 
-        for pdb in self.sec_struc:
+        X = np.empty((n, width), dtype=np.float32)
+        Y = np.empty(n, dtype=np.int8)
 
-            # set all features to the the current PDB contest
-            self._update(pdb, features)
+        row = 0
+        for (_, x, y) in self._map(self._window_block, features, annotator,
+                                   window_size):
 
-            # set up Window Extractor for current PDB file
-            with open(pdb, 'r') as f:
+            X[row:row + len(y)] = x
+            Y[row:row + len(y)] = y
+            row += len(y)
 
-                struc = PDBParser().get_structure(get_id(pdb), f)
+        return X[:row], Y[:row]
 
-                # ensure that the current structure contains Hydrogens
-                #sha = StructureHydrogenAdder(struc)
-                #sha.supplement()
-                #struc = sha.struc
+    def construct_window_blocks(self, features, annotator, window_size):
+        """
+        Constructs the rows of the window matrix separately for each PDB
+        file, such that the matrices of arbitrary subsets of the PDB files
+        can be assembled without encoding the windows again.
 
-                helix_aa, strand_aa, _ = self.sec_struc[pdb]
-                we = WindowExtractor(struc, window_size, features)
+        :param features: List of features as defined by the
+        feature module.
+        :param annotator:
+        :param window_size: Window size to be used to encode the features with.
+        :return: Dictionary, which maps each PDB file to a 3-tuple
+        (positions, X, Y), where positions are the positions of the first
+        residues of the windows and X, Y are the rows of the PDB file as
+        returned by `construct_window_matrix`.
+        """
+        blocks = list(self._map(self._window_block, features, annotator,
+                                window_size))
 
-                for (positions, training_point) in we.entities():
+        return dict(zip(self.pdb_files, blocks))
 
-                    X.append(training_point)
-                    Y.append(annotator(positions, helix_aa, strand_aa))
+    def _window_block(self, pdb, features, annotator, window_size):
+        """
+        Constructs the rows of the window matrix of a single PDB file. The
+        encoded windows are taken from the feature store, if possible.
+        """
+        if conf.feature_store is None:
+            positions, X = self._encode_windows(pdb, features, window_size)
+        else:
+            positions, X = self._stored_windows(pdb, features, window_size)
 
-        return X, Y
+        # the classes of the windows are not stored, as they depend on the
+        # annotator and are cheap to assign
+        helix_aa, strand_aa, _ = self.sec_struc[pdb]
+        Y = np.array([annotator(range(pos, pos + window_size),
+                                helix_aa, strand_aa)
+                      for pos in positions], dtype=np.int8)
+
+        return positions, X, Y
+
+    def _encode_windows(self, pdb, features, window_size):
+        """
+        Encodes all windows of a single PDB file with `features`.
+
+        :return: Positions of the first residue of each window and the
+        matrix of the encoded windows.
+        """
+        # set all features to the the current PDB contest
+        self._update(pdb, features)
+
+        # set up Window Extractor for current PDB file, the structure
+        # is obtained from the structure cache
+        we = WindowExtractor(pdb, window_size, features)
+
+        positions, X = we.windows()
+
+        return positions.astype(np.int32), X
+
+    def _stored_windows(self, pdb, features, window_size):
+        """
+        Fetches the encoded windows of a single PDB file from the feature
+        store. Only the features that are not stored yet are encoded, and
+        their blocks are added to the store.
+
+        :return: Positions of the first residue of each window and the
+        matrix of the encoded windows.
+        """
+        store = conf.feature_store
+
+        positions = store.get_positions(pdb, window_size)
+
+        if positions is None:
+            blocks = [None] * len(features)
+        else:
+            blocks = [store.get(pdb, window_size, feature)
+                      for feature in features]
+
+        missing = [index for (index, block) in enumerate(blocks)
+                   if block is None]
+
+        if missing:
+            positions, X = self._encode_windows(
+                pdb, [features[index] for index in missing], window_size)
+
+            store.put_positions(pdb, window_size, positions)
+
+            # split the new matrix into the blocks of the single features
+            col = 0
+            for index in missing:
+
+                width = features[index].width(window_size)
+                blocks[index] = X[:, col:col + width]
+                store.put(pdb, window_size, features[index], blocks[index])
+                col += width
+
+        if len(blocks) == 1:
+            return positions, blocks[0]
+
+        return positions, np.hstack(blocks)
 
     def construct_sheet_matrix(self, features):
 
         X = []
         Y = []
 
-        for pdb in self.sec_struc:
+        for (x, y) in self._map(self._sheet_block, features):
+            X.extend(x)
+            Y.extend(y)
 
-            # set all features to the current PDB contest
-            self._update(pdb, features)
+        return np.array(X, dtype=np.float32), np.array(Y, dtype=np.int8)
 
-            _, _, sheets = self.sec_struc[pdb]
+    def _sheet_block(self, pdb, features):
+        """
+        Constructs the rows of the sheet matrix of a single PDB file.
+        """
+        X = []
+        Y = []
 
-            # consider each sheet
-            for sheet in sheets:
+        # set all features to the current PDB contest
+        self._update(pdb, features)
 
-                # extract all linked pairs of Strands
-                for (strand1, strand2) in window(sheet, 2):
+        _, _, sheets = self.sec_struc[pdb]
 
-                    # use all features to encode bots strands
-                    training_points = sheet_encode(range(strand1[0], strand1[1] + 1),
-                                                   range(strand2[0], strand2[1] + 1),
-                                                   features, pdb)
-                    X.append(training_points)
-                    Y.append(strand2[2])
+        # consider each sheet
+        for sheet in sheets:
+
+            # extract all linked pairs of Strands
+            for (strand1, strand2) in window(sheet, 2):
+
+                # use all features to encode bots strands
+                training_points = sheet_encode(range(strand1[0], strand1[1] + 1),
+                                               range(strand2[0], strand2[1] + 1),
+                                               features, pdb)
+                X.append(training_points)
+                Y.append(strand2[2])
         return X, Y
 
     def get_sheets(self):
@@ -108,3 +261,22 @@ class FeatureContext(object):
         return {k: v[2] for k, v in self.sec_struc.iteritems()}
 
 
+def _width(features, window_size):
+    """
+    Computes the number of columns of the window matrix of `features`.
+    """
+    widths = [feature.width(window_size) for feature in features]
+
+    if None in widths:
+        raise ValueError("All features of a window matrix must have a "
+                         "fixed width.")
+
+    return sum(widths)
+
+
+def _max_windows(pdb, window_size):
+    """
+    Returns the maximal number of windows of size `window_size` of
+    the PDB file `pdb`.
+    """
+    return max(0, len(conf.structure_cache.get_backbone(pdb)) - window_size + 1)
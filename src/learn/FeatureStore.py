@@ -0,0 +1,138 @@
+"""
+Persistent store of encoded windows. Encoding the windows of a PDB file is
+the most expensive part of constructing a window matrix, so the encoded
+blocks of each PDB file are written to disk once and reused by all later
+runs, regardless of the predictors that are trained on them.
+"""
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+
+from src.learn.binary_cache import file_digest
+
+
+class FeatureStore(object):
+    """
+    Stores the encoding of the windows of a PDB file as one block per
+    feature and window size in the .npy format, such that the blocks can be
+    memory mapped.
+
+    A block is keyed by the content of the PDB file, the window size and the
+    class and the parameters of the feature (see
+    `WindowFeature.parameters`). Thus, a PDB file or a feature that changes
+    is encoded again, whereas the file name does not matter.
+    """
+
+    def __init__(self, directory):
+        """
+        Creates new Feature Store. The directory is created when the first
+        block is written.
+
+        :param directory: Directory in which the blocks are stored.
+        """
+        self.directory = directory
+
+        # maps (path, mtime) of PDB files to the digest of their content
+        self._digests = {}
+
+    def digest(self, pdb_path):
+        """
+        Computes the SHA1 digest of the content of a PDB file.
+
+        :param pdb_path: Path to the PDB file.
+        :return: Digest as hex string.
+        """
+        path = os.path.abspath(pdb_path)
+        key = (path, os.stat(path).st_mtime)
+
+        if key not in self._digests:
+            self._digests[key] = file_digest(path)
+
+        return self._digests[key]
+
+    def _path(self, pdb_path, window_size, name):
+
+        key = '|'.join([self.digest(pdb_path), str(window_size), name])
+        return self.directory + os.path.sep + \
+            hashlib.sha1(key).hexdigest() + '.npy'
+
+    def _load(self, path):
+
+        if not os.path.exists(path):
+            return None
+
+        # empty arrays cannot be memory mapped
+        array = np.load(path, mmap_mode='r')
+        return array if array.size else np.load(path)
+
+    def _save(self, path, array):
+
+        if not os.path.exists(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # another process might have created the directory
+                if not os.path.isdir(self.directory):
+                    raise
+
+        # write to a temporary file first, such that concurrent processes
+        # never read an incomplete block
+        (fd, temp_path) = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.rename(temp_path, path)
+
+    def get_positions(self, pdb_path, window_size):
+        """
+        Returns the positions of the first residues of all windows of a PDB
+        file, or None if they are not stored.
+        """
+        return self._load(self._path(pdb_path, window_size, 'positions'))
+
+    def put_positions(self, pdb_path, window_size, positions):
+        """
+        Stores the positions of the first residues of all windows of a PDB
+        file.
+        """
+        self._save(self._path(pdb_path, window_size, 'positions'),
+                   np.asarray(positions, dtype=np.int32))
+
+    def get(self, pdb_path, window_size, feature):
+        """
+        Returns the encoded windows of a PDB file, or None if they are not
+        stored.
+
+        :param pdb_path: Path to the PDB file.
+        :param window_size: Window size of the encoded windows.
+        :param feature: WindowFeature the windows are encoded with.
+        :return: Read-only float32 array with one encoded window per row.
+        """
+        return self._load(self._path(pdb_path, window_size,
+                                     feature_key(feature)))
+
+    def put(self, pdb_path, window_size, feature, block):
+        """
+        Stores the encoded windows of a PDB file.
+
+        :param pdb_path: Path to the PDB file.
+        :param window_size: Window size of the encoded windows.
+        :param feature: WindowFeature the windows are encoded with.
+        :param block: Array with one encoded window per row.
+        """
+        self._save(self._path(pdb_path, window_size, feature_key(feature)),
+                   np.asarray(block, dtype=np.float32))
+
+
+def feature_key(feature):
+    """
+    Identifies a feature by its class and its parameters.
+
+    :param feature: WindowFeature instance.
+    :return: String that is equal for all features that encode windows
+    identically.
+    """
+    cls = type(feature)
+    return cls.__module__ + '.' + cls.__name__ + \
+        repr(sorted(feature.parameters().items()))
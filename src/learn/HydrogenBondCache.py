@@ -0,0 +1,115 @@
+"""
+Manages the cache files of the Hydrogen Bonds of the PDB files in the temp
+directory.
+"""
+import os
+
+from src.util import get_id
+from src.learn.binary_cache import read_cache, write_cache
+
+# Kind and suffix of the cache files of Hydrogen Bonds
+HB_CACHE_KIND = 'hbond'
+HB_CACHE_SUFFIX = '.hbb'
+
+
+class HydrogenBondCache(object):
+    """
+    Reads and writes the Hydrogen Bonds of PDB files, one cache file per
+    PDBID in the binary cache format.
+
+    The cache keeps an index of the PDBIDs that have a cache file, which is
+    read from the directory once and updated whenever a cache file is
+    written. Reading a cache file never writes anything, and each missing
+    entry is written exactly once.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory of the cache files.
+        """
+        self.directory = directory
+
+        # PDBIDs that have a cache file, read from the directory on demand
+        self._index = None
+
+    def _pdbids(self):
+
+        if self._index is None:
+
+            if os.path.isdir(self.directory):
+                names = os.listdir(self.directory)
+            else:
+                names = []
+
+            self._index = set(name[:-len(HB_CACHE_SUFFIX)] for name in names
+                              if name.endswith(HB_CACHE_SUFFIX))
+
+        return self._index
+
+    def path(self, pdbid):
+        """
+        Returns the path to the cache file of a PDBID.
+        """
+        return self.directory + os.path.sep + pdbid + HB_CACHE_SUFFIX
+
+    def __contains__(self, pdbid):
+
+        if pdbid in self._pdbids():
+            return True
+
+        # the cache file might have been written by another process
+        if os.path.exists(self.path(pdbid)):
+            self._pdbids().add(pdbid)
+            return True
+
+        return False
+
+    def get(self, pdb_path, min_seq_distance):
+        """
+        Reads the Hydrogen Bonds of a PDB file from its cache file.
+
+        :param pdb_path: Path to the PDB file.
+        :param min_seq_distance: Minimal sequence distance the Hydrogen
+        Bonds must have been computed with.
+        :return: Tuple of the arrays (pairs, energies), or None if the PDB
+        file has no valid cache file.
+        """
+        pdbid = get_id(pdb_path)
+
+        if pdbid not in self:
+            return None
+
+        arrays = read_cache(self.path(pdbid), HB_CACHE_KIND, pdb_path,
+                            {'min_seq_distance': min_seq_distance})
+
+        if arrays is None:
+            return None
+
+        return arrays['pairs'], arrays['energies']
+
+    def put(self, pdb_path, min_seq_distance, pairs, energies):
+        """
+        Writes the Hydrogen Bonds of a PDB file to its cache file.
+
+        :param pdb_path: Path to the PDB file.
+        :param min_seq_distance: Minimal sequence distance the Hydrogen
+        Bonds have been computed with.
+        :param pairs: int32 array of shape (n, 2) with the sorted pairs of
+        positions.
+        :param energies: float32 array of shape (n, 2) with the potentials.
+        """
+        pdbid = get_id(pdb_path)
+
+        if not os.path.exists(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # another process might have created the directory
+                if not os.path.isdir(self.directory):
+                    raise
+
+        write_cache(self.path(pdbid), HB_CACHE_KIND, pdb_path,
+                    [('pairs', pairs), ('energies', energies)],
+                    {'min_seq_distance': min_seq_distance})
+
+        self._pdbids().add(pdbid)
@@ -0,0 +1,304 @@
+"""
+Hydrogen Bonds of a protein chain as sparse matrix. This is the single
+representation of Hydrogen Bonds that is used by the features, the sheet
+prediction and the Pattern Annotator.
+"""
+import re
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from src.conf import conf
+from src.util import get_id
+from src.learn.dssp import hydrogen_bond_energies
+from src.pdb.constants import RE_WHITESPACE
+
+
+class HydrogenBondMatrix(object):
+    """
+    Symmetric sparse matrix in the CSR format, whose rows and columns are the
+    residues of a protein chain (by their index in the chain). The entry of
+    residues r and c has two channels: the potential of the C=O group of r
+    with the N-H group of c and the potential of the N-H group of r with the
+    C=O group of c. Potentials of bonds that do not exist are 0.
+
+    The partners of a residue are found in O(degree). Residues are usually
+    addressed by their positions, residues that share their position
+    (insertion codes) share their Hydrogen Bonds.
+    """
+
+    def __init__(self, positions, indptr, indices, energies):
+        """
+        :param positions: Positions of the residues of the chain.
+        :param indptr: Array of length n_res + 1, the entries of residue r are
+        indptr[r]:indptr[r + 1].
+        :param indices: Column of each entry, sorted within each row.
+        :param energies: float32 array of shape (n_entries, 2) with both
+        potentials of each entry.
+        """
+        self.positions = np.asarray(positions, dtype=np.int32)
+        self.indptr = indptr
+        self.indices = indices
+        self.energies = energies
+
+        # maps the positions to the first residue with this position
+        self._rows = {}
+        for (row, position) in enumerate(self.positions.tolist()):
+            self._rows.setdefault(position, row)
+
+    def __len__(self):
+        """ Number of Hydrogen Bonds, i.e. pairs of bonded residues. """
+        return len(self.indices) // 2
+
+    def row(self, position):
+        """
+        Returns the residue of a position, or None if there is no residue at
+        this position.
+        """
+        return self._rows.get(position)
+
+    def neighbors(self, row):
+        """
+        Returns the residues that form a Hydrogen Bond with residue `row`.
+        """
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def partners(self, position):
+        """
+        Returns the Hydrogen Bonds of the residue at `position`.
+
+        :return: Dictionary, which maps the positions of the partners to both
+        potentials, as seen from the residue at `position`.
+        """
+        row = self._rows.get(position)
+
+        if row is None:
+            return {}
+
+        (start, end) = (self.indptr[row], self.indptr[row + 1])
+
+        return dict(zip(self.positions[self.indices[start:end]].tolist(),
+                        map(tuple, self.energies[start:end].tolist())))
+
+    def pairs(self):
+        """
+        Returns all pairs of bonded residues.
+
+        :return: List of the pairs (left, right) of positions, where left
+        precedes right in the chain, in the order of the chain.
+        """
+        rows = np.repeat(np.arange(len(self.positions)), np.diff(self.indptr))
+        upper = self.indices > rows
+
+        return zip(self.positions[rows[upper]].tolist(),
+                   self.positions[self.indices[upper]].tolist())
+
+    def connected(self, positions1, positions2):
+        """
+        Checks whether any residue of `positions1` forms a Hydrogen Bond with
+        any residue of `positions2`.
+        """
+        targets = set(positions2)
+
+        for position in positions1:
+
+            row = self._rows.get(position)
+
+            if row is not None and \
+                    not targets.isdisjoint(
+                        self.positions[self.neighbors(row)].tolist()):
+                return True
+
+        return False
+
+    def band(self, width):
+        """
+        Arranges the potentials as band, such that the bonds of each residue
+        with its `width` successors are contiguous.
+
+        :param width: Maximal distance of the positions of bonded residues.
+        :return: float32 array of shape (n_res, width, 2), whose entry
+        [r, d - 1] are the potentials of the residue r with the residue at
+        `positions[r] + d`, or 0 if these residues do not form a bond.
+        """
+        n = len(self.positions)
+        band = np.zeros((n, width, 2), dtype=np.float32)
+
+        rows = np.repeat(np.arange(n), np.diff(self.indptr))
+        distance = self.positions[self.indices] - self.positions[rows]
+        selected = (distance >= 1) & (distance <= width)
+
+        band[rows[selected], distance[selected] - 1] = \
+            self.energies[selected]
+
+        # residues that share their position share their bonds
+        first = np.array([self._rows[position]
+                          for position in self.positions.tolist()],
+                         dtype=np.intp)
+
+        return band[first]
+
+
+def matrix_from_arrays(positions, pairs, energies):
+    """
+    Constructs the Hydrogen Bond Matrix of a chain from the arrays of a
+    Hydrogen Bond cache file.
+
+    :param positions: Positions of the residues of the chain.
+    :param pairs: Array of shape (n, 2) with the positions of the residues
+    of each bond, where the first residue precedes the second one.
+    :param energies: Array of shape (n, 2) with both potentials of each bond,
+    as seen from the first residue.
+    :return: HydrogenBondMatrix
+    """
+    positions = np.asarray(positions, dtype=np.int32)
+    n = len(positions)
+
+    rows = {}
+    for (row, position) in enumerate(positions.tolist()):
+        rows.setdefault(position, row)
+
+    # bonds of residues that are not part of the chain are skipped
+    pairs = np.asarray(pairs).tolist()
+    known = np.array([left in rows and right in rows
+                      for (left, right) in pairs], dtype=bool)
+
+    left = np.array([rows[pair[0]] for (pair, keep) in zip(pairs, known)
+                     if keep], dtype=np.intp)
+    right = np.array([rows[pair[1]] for (pair, keep) in zip(pairs, known)
+                      if keep], dtype=np.intp)
+    energies = np.asarray(energies, dtype=np.float32).reshape(-1, 2)[known]
+
+    # each bond is an entry of both of its residues
+    entry_rows = np.concatenate([left, right])
+    entry_cols = np.concatenate([right, left])
+    entry_energies = np.concatenate([energies, energies[:, ::-1]])
+
+    order = np.lexsort((entry_cols, entry_rows))
+
+    indptr = np.zeros(n + 1, dtype=np.intp)
+    indptr[1:] = np.cumsum(np.bincount(entry_rows, minlength=n))
+
+    return HydrogenBondMatrix(positions, indptr, entry_cols[order],
+                              np.ascontiguousarray(entry_energies[order]))
+
+
+def arrays_from_map(potential_map):
+    """
+    Converts a potential map to the arrays of a Hydrogen Bond cache file.
+
+    :param potential_map: Dictionary, which maps pairs of positions to
+    the pair of potentials.
+    :return: int32 array of shape (n, 2) with the sorted pairs of positions
+    and float32 array of shape (n, 2) with the potentials of each pair.
+    """
+    pairs = sorted(potential_map)
+
+    return (np.array(pairs, dtype=np.int32).reshape(len(pairs), 2),
+            np.array([potential_map[pair] for pair in pairs],
+                     dtype=np.float32).reshape(len(pairs), 2))
+
+
+def compute_hydrogen_bonds(backbone, min_seq_distance):
+    """
+    Computes all Hydrogen Bonds that are found in the Backbone `backbone`.
+
+    :param backbone: Backbone of the protein chain
+    :param min_seq_distance: Minimal distance of bonded residues in the AA
+    sequence.
+    :return: Arrays (pairs, energies) as returned by `arrays_from_map`. The
+    first potential of a pair is the potential of the C=O group of the left
+    residue with the N-H group of the right residue, the second one the
+    potential of the other direction. Potentials above the threshold are 0.
+    """
+    # stores both potentials of each pair of residue indices
+    potentials = defaultdict(lambda: [0, 0])
+
+    for (donor, acceptor, energy) in \
+            zip(*hydrogen_bond_energies(backbone, min_seq_distance)):
+
+        if acceptor < donor:
+            potentials[(acceptor, donor)][0] = float(energy)
+        else:
+            potentials[(donor, acceptor)][1] = float(energy)
+
+    return arrays_from_map(
+        {(int(backbone.positions[i]), int(backbone.positions[j])):
+         tuple(potentials[(i, j)]) for (i, j) in sorted(potentials)})
+
+
+def load_hydrogen_bonds(pdb_path, min_seq_distance=2):
+    """
+    Loads the Hydrogen Bonds of a PDB file from its cache file. If there is
+    no valid cache file, the Hydrogen Bonds are computed and written to the
+    cache file.
+
+    :param pdb_path: Path to the PDB file.
+    :param min_seq_distance: Minimal distance of bonded residues in the AA
+    sequence.
+    :return: HydrogenBondMatrix of the PDB file.
+    """
+    backbone = conf.structure_cache.get_backbone(pdb_path)
+
+    # the cache file is only used if the Hydrogen Bonds have been computed
+    # from this PDB file with the same minimal sequence distance
+    cached = conf.hb_cache.get(pdb_path, min_seq_distance)
+
+    # the plain .hb file is read by the PatternAnnotator and the R scripts,
+    # it is written along with the cache file, and only written on a hit if
+    # it is missing
+    hb_path = conf.temp_dir + os.path.sep + get_id(pdb_path) + '.hb'
+
+    if cached is None:
+        cached = compute_hydrogen_bonds(backbone, min_seq_distance)
+        conf.hb_cache.put(pdb_path, min_seq_distance, *cached)
+        write_hb_file(hb_path, *cached)
+
+    elif not os.path.exists(hb_path):
+        write_hb_file(hb_path, *cached)
+
+    return matrix_from_arrays(backbone.positions, *cached)
+
+
+def read_hb_file(hb_path, positions):
+    """
+    Reads a plain Hydrogen Bond file, whose lines consist of the positions of
+    the bonded residues, optionally followed by both potentials.
+
+    :param hb_path: Path to the plain Hydrogen Bond file.
+    :param positions: Positions of the residues of the chain.
+    :return: HydrogenBondMatrix
+    """
+    pairs = []
+    energies = []
+
+    with open(hb_path, 'r') as f:
+        for line in f:
+
+            if not line.strip():
+                continue
+
+            splt = re.split(RE_WHITESPACE, line.strip())
+            pairs.append((int(splt[0]), int(splt[1])))
+            energies.append((float(splt[2]), float(splt[3]))
+                            if len(splt) > 3 else (0, 0))
+
+    return matrix_from_arrays(positions, np.array(pairs).reshape(-1, 2),
+                              energies)
+
+
+def write_hb_file(hb_path, pairs, energies):
+    """
+    Writes a plain Hydrogen Bond file, one line with the positions of the
+    bonded residues and both potentials per Hydrogen Bond.
+
+    :param hb_path: Path to the plain Hydrogen Bond file.
+    :param pairs: Array of shape (n, 2) with the positions of the residues
+    of each bond.
+    :param energies: Array of shape (n, 2) with both potentials of each bond.
+    """
+    with open(hb_path, 'w') as f:
+        for ((a, b), (c, d)) in zip(np.asarray(pairs).tolist(),
+                                    np.asarray(energies).tolist()):
+            f.write(' '.join([str(a), str(b), str(c), str(d)]) + os.linesep)
@@ -1,8 +1,11 @@
 __author__ = 'fillinger'
 
 import target_encoding
-from Bio import PDB
 from src.pdb import extract as ex
+from src.conf import conf
+from src.pdb.backbone import Backbone
+from src.learn.HydrogenBondMatrix import HydrogenBondMatrix,\
+    load_hydrogen_bonds, read_hb_file
 import difflib
 
 class PatternAnnotator(object):
@@ -29,11 +32,27 @@ class PatternAnnotator(object):
     """
 
     def __init__(self, hb_file, pdb_file):
-        # Read the hydrogen bond files (*.hb)
-        self.hb_file = open(hb_file, "r").read().splitlines()
-
-        # Get the protein structure from the pdb-file
-        self.protein = PDB.PDBParser().get_structure("protein", pdb_file)
+        """
+        :param hb_file: Path to a plain hydrogen bond file (*.hb), or
+        HydrogenBondMatrix of the PDB file. If None, the hydrogen bonds are
+        loaded from the cache.
+        :param pdb_file: Path to the PDB file.
+        """
+        # Get the protein backbone from the pdb-file, the arrays of the
+        # cached backbone are shared, but the structure keeps its former id
+        backbone = conf.structure_cache.get_backbone(pdb_file)
+        self.protein = Backbone(backbone.coords, backbone.positions,
+                                backbone.resnames, backbone.chains,
+                                "protein")
+
+        # Read the hydrogen bonds
+        if isinstance(hb_file, HydrogenBondMatrix):
+            self.hydrogen_bonds = hb_file
+        elif hb_file is None:
+            self.hydrogen_bonds = load_hydrogen_bonds(pdb_file)
+        else:
+            self.hydrogen_bonds = read_hb_file(hb_file,
+                                               self.protein.positions)
 
         # safe the file name
         self.pdb_file = pdb_file
@@ -53,9 +72,8 @@ class PatternAnnotator(object):
         """
         list_annotation = []
         list_pairs = []
-        for row in self.hb_file:
+        for pair in self.hydrogen_bonds.pairs():
 
-            pair = (int(row.split(" ")[0]), int(row.split(" ")[1]))
             list_pairs.append(pair)
             list_annotation.append(self.estimate_structure_type(pair))
         return zip(list_pairs, list_annotation)
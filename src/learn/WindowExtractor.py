@@ -1,5 +1,9 @@
+import numpy as np
+
 from src.pdb.extract import get_amino_acids
+from src.pdb.constants import AMINO_ACIDS
 from src.util import window
+from src.conf import conf
 
 class WindowExtractor(object):
 
@@ -13,10 +17,14 @@ class WindowExtractor(object):
         Feature Space and extract specified features for all training points
         of `struc`
 
-        :param struc: BioPython Structure Object
+        :param struc: BioPython Structure Object, Backbone or path to the
+        PDB file, whose Backbone is then obtained from the structure cache.
         :param window_size: Number of consecutive amino acids that should be
         considered as one entity.
         """
+        if isinstance(struc, basestring):
+            struc = conf.structure_cache.get_backbone(struc)
+
         self.struc = struc
         self.positions = positions
         self.features = features
@@ -52,6 +60,78 @@ class WindowExtractor(object):
 
             yield (positions, self._encode(entity))
 
+    def windows(self, chain='A'):
+        """
+        Encodes all windows of this PDB file at once. Features that encode
+        all windows at once (see `WindowFeature.encode_windows`), for
+        instance from a strided view on their encoded residues, do so. Only
+        the remaining features encode each window separately. The structure
+        must be a Backbone.
+
+        :param chain: Identifier of the chain of the amino acids.
+        :return: Positions of the first residues of the windows and float32
+        matrix with one encoded window per row, in the order of `entities`.
+        """
+        bb = self.struc
+
+        # the same amino acids as those of `get_amino_acids`
+        selected = (bb.chains == chain) & np.in1d(bb.resnames, AMINO_ACIDS)
+
+        if self.positions is not None:
+            selected &= np.in1d(bb.positions, list(self.positions))
+
+        index = np.flatnonzero(selected)
+        first = consecutive_windows(bb.positions[index], self.window_size)
+
+        blocks = []
+        residues = None
+
+        for feature in self.features:
+
+            block = feature.encode_windows(bb, index, first,
+                                           self.window_size)
+
+            if block is not None:
+                blocks.append(block)
+                continue
+
+            # fall back to encoding each window on its own
+            if residues is None:
+                residues = [bb[i] for i in index]
+
+            block = [feature.encode(residues[start:start + self.window_size])
+                     for start in first]
+            blocks.append(np.array(block, dtype=np.float32).reshape(
+                len(first), feature.width(self.window_size)))
+
+        if not blocks:
+            return bb.positions[index][first], \
+                np.empty((len(first), 0), dtype=np.float32)
+
+        return bb.positions[index][first], np.hstack(blocks)
+
+
+def consecutive_windows(positions, window_size):
+    """
+    Finds all windows of consecutive positions.
+
+    :param positions: Array of the positions of the amino acids.
+    :param window_size: Number of amino acids of a window.
+    :return: Array of the indices of the first amino acids of all windows,
+    whose positions form a range, as checked by `is_consecutive`.
+    """
+    n = len(positions) - window_size + 1
+
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # counts the chain breaks, i.e. the neighbours that are not adjacent
+    # in the AA sequence, up to each amino acid
+    breaks = np.zeros(len(positions), dtype=np.intp)
+    breaks[1:] = np.cumsum(np.diff(positions) != 1)
+
+    return np.flatnonzero(breaks[window_size - 1:] == breaks[:n])
+
 
 def is_consecutive(positions):
     """
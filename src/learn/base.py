@@ -1,16 +1,13 @@
 from __future__ import division
 from collections import defaultdict
 
-from Bio.PDB import PDBParser
-
 from src.learn.features.WindowIdentity import WindowIdentity
 from src.learn.sheets import predict_sheets
-from src.util import window, get_id
+from src.util import window
 from src.learn.target_encoding import TARGET_CODES
 from src.learn.WindowExtractor import WindowExtractor
 from src.learn.FeatureContext import FeatureContext
 from src.learn.features.HydrogenBondPattern import HydrogenBondPattern
-from src.pdb.extract import get_amino_acids
 from src.conf import conf
 from feature_list import helix_features, strand_features
 
@@ -71,22 +68,37 @@ def expand(struc, Y, window_size):
     Annotates each Amino Acid of pdb_file with class label
     using the specified window size
 
-    :param struc:  BioPython Structure object whose Amino Acids should be
-    annotated.
+    :param struc:  BioPython Structure object or Backbone whose Amino Acids
+    should be annotated.
     :param Y: Vector of class labels of windows
     :param window_size: Window size of windows
     :return: Class Labeling of each amino acid of pdb_file
     """
+    we = WindowExtractor(struc, window_size, [WindowIdentity()])
+
+    positions = [window_positions[0]
+                 for (window_positions, _) in we.entities()]
+
+    return expand_positions(positions, Y, window_size)
+
+
+def expand_positions(positions, Y, window_size):
+    """
+    Annotates each Amino Acid covered by the windows with class label.
 
+    :param positions: Positions of the first residues of the windows, as
+    returned by `FeatureContext.construct_window_blocks`
+    :param Y: Vector of class labels of windows
+    :param window_size: Window size of windows
+    :return: Class Labeling of each amino acid covered by the windows
+    """
     # maps AA positions to respective class
     aa_map = defaultdict(lambda: TARGET_CODES['Coil'])
 
-    we = WindowExtractor(struc, window_size, [WindowIdentity()])
-
-    for (index, (positions, _)) in enumerate(we.entities()):
+    for (index, first) in enumerate(positions):
 
         # for all residues in the entity
-        for pos in positions:
+        for pos in xrange(int(first), int(first) + window_size):
 
             # if pos is still Coil, we assume class that we see
             if aa_map[pos] == TARGET_CODES['Coil']:
@@ -129,11 +141,10 @@ def annotate(pdb_file):
                                                   conf.strand_window_size)
 
     # if we cannot extract features from this PDB file, return None
-    if not XHelix:
+    if not len(XHelix):
         return None, None
 
-    with open(pdb_file, 'r') as f:
-        struc = PDBParser().get_structure(get_id(pdb_file), f)
+    struc = conf.structure_cache.get_backbone(pdb_file)
 
     # predict Helix position
     helix_predictor = conf.helix_predictor
@@ -155,7 +166,7 @@ def annotate(pdb_file):
 
     sheet_bonds = HydrogenBondPattern(2, mode='pairs')
     sheet_bonds.tell_context(pdb_file)
-    hydrogen_bonds = sheet_bonds.encode(get_amino_acids(struc))
+    hydrogen_bonds = sheet_bonds.hydrogen_bonds
 
     # get true annotations of sheets
     true_sheets = fc.get_sheets()[pdb_file]
@@ -184,41 +195,63 @@ def annotate_no_sheet(pdb_file):
     fc = FeatureContext([pdb_file])
 
     # get feature Matrix for Helices of PDB file
-    XHelix, YHelix = fc.construct_window_matrix(helix_features,
-                                                conf.helix_assigner,
-                                                conf.helix_window_size)
+    helix_windows = fc.construct_window_blocks(helix_features,
+                                               conf.helix_assigner,
+                                               conf.helix_window_size)
 
-    XStrand, YStrand = fc.construct_window_matrix(strand_features,
-                                                  conf.strand_assigner,
-                                                  conf.strand_window_size)
+    strand_windows = fc.construct_window_blocks(strand_features,
+                                                conf.strand_assigner,
+                                                conf.strand_window_size)
+
+    return annotate_windows(helix_windows[pdb_file], strand_windows[pdb_file])
+
+
+def annotate_windows(helix_windows, strand_windows, helix_predictor=None,
+                     strand_predictor=None):
+    """
+    Annotates a PDB file whose windows have already been encoded, for
+    instance once for all folds of a cross-validation.
+
+    :param helix_windows: Encoded helix windows of the PDB file as 3-tuple
+    (positions, X, Y), see `FeatureContext.construct_window_blocks`.
+    :param strand_windows: Encoded strand windows of the PDB file.
+    :param helix_predictor: Fitted Helix predictor. Defaults to the
+    predictor of the central configuration.
+    :param strand_predictor: Fitted Strand predictor. Defaults to the
+    predictor of the central configuration.
+    :return: True and predicted annotation of the PDB file
+    """
+    if helix_predictor is None:
+        helix_predictor = conf.helix_predictor
+
+    if strand_predictor is None:
+        strand_predictor = conf.strand_predictor
+
+    (helix_positions, XHelix, YHelix) = helix_windows
+    (strand_positions, XStrand, YStrand) = strand_windows
 
     # if we cannot extract features from this PDB file, return None
-    if not XHelix:
+    if not len(XHelix):
         return None, None
 
-    with open(pdb_file, 'r') as f:
-        struc = PDBParser().get_structure(get_id(pdb_file), f)
-
     # predict Helix position
-    helix_predictor = conf.helix_predictor
     pred_helix = helix_predictor.predict(XHelix)
     pred_helix = correct_helices(pred_helix)
 
     # predict Strand Positions
-    strand_predictor = conf.strand_predictor
     pred_strand = strand_predictor.predict(XStrand)
     pred_strand = correct_strand(pred_strand)
 
     # expand predicted helix and strand annotations
-    pred_helix_expand = expand(struc, pred_helix,
-                               conf.helix_window_size)
-    pred_strand_expand = expand(struc, pred_strand,
-                                conf.strand_window_size)
-
-    true_helix_expand = expand(struc, YHelix,
-                               conf.helix_window_size)
-    true_strand_expand = expand(struc, YStrand,
-                                conf.strand_window_size)
+    pred_helix_expand = expand_positions(helix_positions, pred_helix,
+                                         conf.helix_window_size)
+    pred_strand_expand = expand_positions(strand_positions, pred_strand,
+                                          conf.strand_window_size)
+
+    true_helix_expand = expand_positions(helix_positions, YHelix,
+                                         conf.helix_window_size)
+    true_strand_expand = expand_positions(strand_positions, YStrand,
+                                          conf.strand_window_size)
 
     # merge separate predictions of helices and sheets
     pred_expand = merge_prediction(pred_helix_expand, pred_strand_expand)
@@ -0,0 +1,180 @@
+"""
+Binary format of the files that cache data computed from PDB files in the
+temp directory, for instance the hydrogen bonds of a structure.
+
+A cache file consists of a small JSON header followed by the raw data of
+Numpy arrays, which are memory mapped when the file is read. The header
+records the version of the format, the kind of the data, parameters the data
+depends on, and the size, modification time and SHA1 digest of the PDB file
+the data has been computed from. A cache file is only used if all of them
+match, so outdated cache files are never read.
+"""
+import os
+import json
+import struct
+import hashlib
+import tempfile
+
+import numpy as np
+
+# Version of the format, cache files of other versions are ignored
+FORMAT_VERSION = 1
+
+MAGIC = 'SSEC'
+
+# The raw data of each array starts at a multiple of this number of bytes
+ALIGNMENT = 64
+
+
+def file_digest(path):
+    """
+    Computes the SHA1 digest of the content of a file.
+
+    :param path: Path to the file.
+    :return: Digest as hex string.
+    """
+    sha1 = hashlib.sha1()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
+
+
+def write_cache(path, kind, source_path, arrays, parameters=None):
+    """
+    Writes a cache file. The file is written to a temporary file first and
+    then renamed, such that readers never see an incomplete file.
+
+    :param path: Path of the cache file.
+    :param kind: Kind of the cached data, for instance 'hbond'.
+    :param source_path: Path to the PDB file the data was computed from.
+    :param arrays: List of (name, array) tuples.
+    :param parameters: Dictionary of the parameters the data depends on.
+    """
+    stat = os.stat(source_path)
+
+    header = {'version': FORMAT_VERSION,
+              'kind': kind,
+              'parameters': parameters or {},
+              'source': {'size': stat.st_size,
+                         'mtime': stat.st_mtime,
+                         'sha1': file_digest(source_path)},
+              'arrays': []}
+
+    arrays = [(name, np.ascontiguousarray(array)) for (name, array) in arrays]
+
+    # the offsets depend on the length of the header, which in turn
+    # contains the offsets, so the header is reserved generously
+    reserved = len(json.dumps(header)) + 256 * (len(arrays) + 1)
+    offset = _align(len(MAGIC) + 4 + reserved)
+
+    for (name, array) in arrays:
+
+        header['arrays'].append({'name': name,
+                                 'dtype': array.dtype.str,
+                                 'shape': list(array.shape),
+                                 'offset': offset})
+        offset = _align(offset + array.nbytes)
+
+    encoded = json.dumps(header)
+    encoded += ' ' * (reserved - len(encoded))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    (fd, temp_path) = tempfile.mkstemp(suffix='.tmp', dir=directory)
+
+    with os.fdopen(fd, 'wb') as f:
+
+        f.write(MAGIC + struct.pack('<I', reserved) + encoded)
+
+        for (entry, (_, array)) in zip(header['arrays'], arrays):
+            f.seek(entry['offset'])
+            f.write(array.tostring())
+
+    os.rename(temp_path, path)
+
+
+def read_cache(path, kind, source_path, parameters=None):
+    """
+    Reads a cache file, if it is valid for the PDB file `source_path`.
+
+    :param path: Path of the cache file.
+    :param kind: Expected kind of the cached data.
+    :param source_path: Path to the PDB file the data should belong to.
+    :param parameters: Dictionary of the parameters the data must have been
+    computed with.
+    :return: Dictionary that maps the names of the arrays to read-only
+    arrays, or None if the cache file does not exist, has another format or
+    is outdated.
+    """
+    header = read_header(path)
+
+    if header is None or header['version'] != FORMAT_VERSION or \
+            header['kind'] != kind or \
+            header['parameters'] != (parameters or {}) or \
+            not _is_source(header['source'], source_path):
+        return None
+
+    arrays = {}
+
+    for entry in header['arrays']:
+
+        shape = tuple(entry['shape'])
+
+        # empty arrays cannot be memory mapped
+        if not np.prod(shape):
+            arrays[entry['name']] = np.empty(shape, dtype=entry['dtype'])
+        else:
+            arrays[entry['name']] = np.memmap(path, dtype=entry['dtype'],
+                                              mode='r',
+                                              offset=entry['offset'],
+                                              shape=shape)
+    return arrays
+
+
+def read_header(path):
+    """
+    Reads the header of a cache file.
+
+    :param path: Path of the cache file.
+    :return: Header as dictionary, or None if the file does not exist or is
+    not a cache file.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as f:
+
+        start = f.read(len(MAGIC) + 4)
+
+        if len(start) < len(MAGIC) + 4 or not start.startswith(MAGIC):
+            return None
+
+        (length,) = struct.unpack('<I', start[len(MAGIC):])
+
+        try:
+            return json.loads(f.read(length))
+        except ValueError:
+            return None
+
+
+def _is_source(source, source_path):
+    """
+    Checks whether the PDB file `source_path` is the file described by
+    `source`. The content is only compared if the modification time differs.
+    """
+    stat = os.stat(source_path)
+
+    if stat.st_size != source['size']:
+        return False
+
+    if stat.st_mtime == source['mtime']:
+        return True
+
+    return file_digest(source_path) == source['sha1']
+
+
+def _align(offset):
+
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
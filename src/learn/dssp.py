@@ -1,8 +1,113 @@
 from __future__ import division
+
+import numpy as np
+
 import src.pdb.constants as co
+from src.geometry.NeighborIndex import NeighborIndex
 
 
 def potential(r_ON, r_CH, r_OH, r_CN):
 
     return co.Q1 * co.Q2 * ((1/r_ON) + (1/r_CH) - (1/r_OH) - (1/r_CN)) *\
         co.DIMENSIONAL_FACTOR
+
+
+def hydrogen_bond_energies(backbone, min_seq_distance,
+                           cutoff=co.HBOND_MAX_ON_DISTANCE,
+                           block_elements=co.HBOND_BLOCK_ELEMENTS):
+    """
+    Computes the DSSP energies of all hydrogen bonds between the N-H groups
+    (donors) and the C=O groups (acceptors) of a Backbone. The energies of
+    the candidate pairs are computed vectorized, in blocks of at most
+    `block_elements` pairs.
+
+    Candidate pairs are the donors whose nitrogen lies within `cutoff` of the
+    oxygen of the acceptor, found with a spatial index. If `cutoff` is None,
+    all donor x acceptor pairs are candidates.
+
+    :param backbone: Backbone whose hydrogen bonds should be computed.
+    :param min_seq_distance: Minimal distance of the positions of donor and
+    acceptor in the AA sequence.
+    :param cutoff: Maximal distance of nitrogen and oxygen of a hydrogen bond.
+    :param block_elements: Maximal number of pairs to be computed at once.
+    :return: 3-tuple (donors, acceptors, energies) of arrays, where
+    donors and acceptors are the indices of the residues in the backbone.
+    Only bonds with an energy below the threshold are reported.
+    """
+    coords = backbone.coords.astype(np.float64)
+    positions = backbone.positions
+    present = backbone.present
+
+    nitrogen = coords[:, 0]
+    carbon = coords[:, 2]
+    oxygen = coords[:, 3]
+    hydrogen = coords[:, 4]
+
+    # only residues with a complete N, CA, C, O backbone are considered,
+    # donors must also have a hydrogen
+    valid = np.all(present[:, :4], axis=1)
+    is_donor = valid & present[:, 4]
+
+    donors = []
+    acceptors = []
+    energies = []
+
+    for (d, a) in _candidates(nitrogen, oxygen, cutoff, block_elements):
+
+        # discard pairs that are not considered at all
+        keep = is_donor[d] & valid[a] & (d != a)
+        keep &= np.abs(positions[d] - positions[a]) >= min_seq_distance
+        d = d[keep]
+        a = a[keep]
+
+        pot = potential(_norm(oxygen[a] - nitrogen[d]),
+                        _norm(carbon[a] - hydrogen[d]),
+                        _norm(oxygen[a] - hydrogen[d]),
+                        _norm(carbon[a] - nitrogen[d]))
+
+        bond = pot < co.HBOND_THRESHOLD
+
+        donors.append(d[bond])
+        acceptors.append(a[bond])
+        energies.append(pot[bond])
+
+    if not energies:
+        return (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp),
+                np.empty(0))
+
+    return (np.concatenate(donors), np.concatenate(acceptors),
+            np.concatenate(energies))
+
+
+def _candidates(nitrogen, oxygen, cutoff, block_elements):
+    """
+    Generates blocks of candidate (donor, acceptor) pairs as pairs of index
+    arrays.
+    """
+    n = len(nitrogen)
+
+    if cutoff is None:
+
+        # consider all pairs, a block consists of several donors
+        block_size = max(1, block_elements // max(1, n))
+
+        for start in xrange(0, n, block_size):
+
+            block = np.arange(start, min(n, start + block_size))
+
+            yield np.repeat(block, n), np.tile(np.arange(n), len(block))
+
+    else:
+        (d, a) = NeighborIndex(nitrogen).pairs(NeighborIndex(oxygen), cutoff)
+
+        for start in xrange(0, len(d), block_elements):
+            yield (d[start:start + block_elements],
+                   a[start:start + block_elements])
+
+
+def _norm(vectors):
+    """
+    Computes the lengths of all vectors, which are given as array of
+    shape (n, 3).
+    """
+    return np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
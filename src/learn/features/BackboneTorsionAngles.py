@@ -1,14 +1,8 @@
-import os
-import cPickle
-from collections import defaultdict
-
-from Bio.PDB import PDBParser
 import numpy as np
 
 from src.learn.features.WindowFeature import WindowFeature
 from src.learn.features.SheetFeature import SheetFeature
-from src.pdb.extract import get_backbone_torsion_angles, get_amino_acids
-from src.util import get_id
+from src.pdb.extract import get_backbone_torsion_angles
 from src.conf import conf
 
 
@@ -18,25 +12,25 @@ class BackboneTorsionAngles(WindowFeature, SheetFeature):
         super(BackboneTorsionAngles, self).__init__()
         self.torsion_angles = None
 
-    def tell_context(self, pdb_path):
+    def _compute_context(self, pdb_path):
 
-        pdbid = get_id(pdb_path)
+        # the torsion angles of all residues are computed at once from the
+        # cached backbone, which is cheaper than caching them in the temp
+        # directory
+        backbone = conf.structure_cache.get_backbone(pdb_path)
+        return get_backbone_torsion_angles(backbone)
+
+    def tell_context(self, pdb_path):
 
-        with open(pdb_path, 'r') as f:
-            struc = PDBParser().get_structure(get_id(pdb_path), f)
+        # the torsion angles are shared with all other instances, via the
+        # context cache
+        self.torsion_angles = conf.context_cache.get(self, pdb_path,
+                                                     self._compute_context)
 
-        # check whether torsion angles exist for this structure in the
-        # temp dirctory
-        ta_path = conf.temp_dir + os.path.sep + pdbid + '.ta'
+    def width(self, window_size):
 
-        if os.path.exists(ta_path):
-            with open(ta_path, 'r') as f:
-                self.torsion_angles = defaultdict(lambda: (0, 0),
-                                                  cPickle.load(f))
-        else:
-            self.torsion_angles = get_backbone_torsion_angles(get_amino_acids(struc))
-            with open(ta_path, 'w') as f:
-                cPickle.dump(dict(self.torsion_angles), f)
+        # phi and psi angle of each residue
+        return 2 * window_size
 
     def encode(self, entity):
 
@@ -45,6 +39,17 @@ class BackboneTorsionAngles(WindowFeature, SheetFeature):
                 for f in (lambda x: self.torsion_angles[x][0],
                           lambda x: self.torsion_angles[x][1])]
 
+    def encode_residues(self, backbone):
+
+        # phi and psi angle of each residue of `backbone`, looked up by
+        # position like in `encode`, such that residues that share their
+        # position (insertion codes) are encoded identically
+        torsion_angles = get_backbone_torsion_angles(backbone)
+
+        return np.array([torsion_angles[pos]
+                         for pos in backbone.positions.tolist()],
+                        dtype=np.float32).reshape(len(backbone), 2)
+
     def encode_sheet(self, strand1, strand2):
 
         strand1_phi = []
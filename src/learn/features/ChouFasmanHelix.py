@@ -1,4 +1,6 @@
 __author__ = 'lukas'
+import numpy as np
+
 from src.learn.features.WindowFeature import WindowFeature
 
 HELICES = {'GLU': 1.53,
@@ -43,11 +45,24 @@ STRANDS = {'MET': 1.67,
            'PRO': 0.62,
            'GLU': 0.26}
 
+def _encode_resnames(resnames, parameters):
+    """
+    Encodes each residue name with its `Chou-Fasman` parameter.
+
+    :return: Array of shape (n_res, 1).
+    """
+    return np.array([parameters[name.upper()] for name in resnames],
+                    dtype=np.float32).reshape(len(resnames), 1)
+
+
 class ChouFasmanHelix(WindowFeature):
 
     def __init__(self):
         super(ChouFasmanHelix, self).__init__()
 
+    def width(self, window_size):
+        return window_size
+
     def encode(self, entity):
         """
         Encodes list of residues `entity` with corresponding `Chou-Fasman`
@@ -58,11 +73,17 @@ class ChouFasmanHelix(WindowFeature):
         """
         return [HELICES[aa.get_resname().upper()] for aa in entity]
 
+    def encode_residues(self, backbone):
+        return _encode_resnames(backbone.resnames, HELICES)
+
 class ChouFasmanStrand(WindowFeature):
 
     def __init__(self):
         super(ChouFasmanStrand, self).__init__()
 
+    def width(self, window_size):
+        return window_size
+
     def encode(self, entity):
         """
         Encodes list of residues `entity` with corresponding `Chou-Fasman`
@@ -72,3 +93,6 @@ class ChouFasmanStrand(WindowFeature):
         :return: Chou Fasman encoding of this entity as list
         """
         return [STRANDS[aa.get_resname().upper()] for aa in entity]
+
+    def encode_residues(self, backbone):
+        return _encode_resnames(backbone.resnames, STRANDS)
@@ -2,6 +2,10 @@
 All Features that want to encode Windows of consecutive amino acid sequences
 must inherit from this class.
 """
+import numpy as np
+
+from src.util import sliding_windows
+
 
 class WindowFeature(object):
 
@@ -11,5 +15,57 @@ class WindowFeature(object):
     def encode(self, entity):
         pass
 
+    def encode_residues(self, backbone):
+        """
+        Encodes each residue of the Backbone of the current context on its
+        own. Features whose encoding of a window is the concatenation of the
+        encodings of its residues should override this method, such that
+        windows do not have to be encoded separately.
+
+        :param backbone: Backbone of the current context.
+        :return: Array of shape (n_res, k) with the encoding of each residue
+        of `backbone`, or None if windows have to be encoded separately.
+        """
+        return None
+
+    def encode_windows(self, backbone, index, first, window_size):
+        """
+        Encodes many windows of consecutive residues of the Backbone of the
+        current context at once. By default, the windows are taken from a
+        strided view on the residues encoded by `encode_residues`.
+
+        :param backbone: Backbone of the current context.
+        :param index: Indices of the residues of `backbone` the windows are
+        made of.
+        :param first: Indices into `index` of the first residues of the
+        windows.
+        :param window_size: Number of residues of a window.
+        :return: float32 matrix with the encoding of each window per row, or
+        None if windows have to be encoded separately by `encode`.
+        """
+        encoding = self.encode_residues(backbone)
+
+        if encoding is None:
+            return None
+
+        encoding = np.ascontiguousarray(encoding[index], dtype=np.float32)
+        return sliding_windows(encoding, window_size)[first]
+
+    def width(self, window_size):
+        """
+        Returns the number of values the encoding of a window of
+        `window_size` amino acids consists of, or None if the encoding
+        has no fixed length.
+        """
+        return None
+
+    def parameters(self):
+        """
+        Returns the parameters of this feature as dictionary. Two features of
+        the same class with equal parameters must encode windows identically,
+        as their encodings are shared by the feature store.
+        """
+        return {}
+
     def tell_context(self, pdb_path):
         return None
@@ -13,6 +13,9 @@ class WindowIdentity(WindowFeature):
     def tell_context(self, pdb_path):
         pass
 
+    def width(self, window_size):
+        return window_size
+
     def encode(self, entity):
 
         return list(entity)
@@ -1,4 +1,4 @@
-from itertools import combinations
+from collections import defaultdict
 
 import numpy as np
 
@@ -29,55 +29,39 @@ def sheet_encode(strand1, strand2, features, pdb_path):
 
 
 
-def predict_sheets(hb_pairs, strand_positions, pdb_path):
+def predict_sheets(hydrogen_bonds, strand_positions, pdb_path):
+    """
+    Predicts the sheets formed by the predicted strands.
+
+    :param hydrogen_bonds: HydrogenBondMatrix of the PDB file.
+    :param strand_positions: Positions of the residues in predicted strands.
+    :param pdb_path: Path to the PDB file.
+    :return: List of sheets, each of which is a list of strands (a, b,
+    orientation).
+    """
+    # maximal runs of consecutive strand positions, each bond between
+    # two runs is extended to these runs
+    runs = strand_runs(strand_positions)
 
     # all determined strands
     strands = []
 
-    for (a, b) in hb_pairs:
+    for (a, b) in hydrogen_bonds.pairs():
 
         # if the distance is not sufficient, skip this bond
         if np.abs(a - b) < 5:
             continue
 
         # skip this hydrogen bond, if it does not connect sheets
-        if a not in strand_positions or b not in strand_positions:
+        if a not in runs or b not in runs:
             continue
 
-        left_a = a
-        right_a = a
-        left_b = b
-        right_b = b
-
-        # try to extend the sheets as most as possible
-        while True:
-
-            strand1 = range(left_a, right_a + 1)
-            strand2 = range(left_b, right_b + 1)
-
-            if left_a - 1 in strand_positions:
-                left_a -= 1
-                continue
-
-            if right_a + 1 in strand_positions:
-                right_a += 1
-                continue
-
-            if left_b - 1 in strand_positions:
-                left_b -= 1
-                continue
-
-            if right_b + 1 in strand_positions:
-                right_b += 1
-                continue
-            break
-
-        strands.append(strand1)
-        strands.append(strand2)
+        strands.append(range(runs[a][0], runs[a][1] + 1))
+        strands.append(range(runs[b][0], runs[b][1] + 1))
 
     # all strands have been collected, try to merge them where possible
     merged = merge_strands(strands)
-    sheets = join_strands(merged, hb_pairs, pdb_path)
+    sheets = join_strands(merged, hydrogen_bonds, pdb_path)
 
     for sheet in sheets:
         for i in range(len(sheet)):
@@ -89,77 +73,160 @@ def predict_sheets(hb_pairs, strand_positions, pdb_path):
     return sheets
 
 
-def connected(positions1, positions2, pairs):
+def connected(positions1, positions2, hydrogen_bonds):
+
+    # only the partners of the residues of positions1 are considered
+    return hydrogen_bonds.connected(positions1, positions2)
 
-    for (left, right) in [(c, d)
-                        for c in positions1
-                        for d in positions2]:
+def strand_runs(strand_positions):
+    """
+    Finds the maximal runs of consecutive positions.
+
+    :param strand_positions: Positions of the residues in predicted strands.
+    :return: Dictionary, which maps each position to the first and the last
+    position of its run.
+    """
+    runs = {}
+    positions = sorted(set(strand_positions))
 
-        if (left, right) in pairs or (right, left) in pairs:
+    start = 0
+    for i in xrange(1, len(positions) + 1):
 
-            return True
+        # a run ends before a gap and at the last position
+        if i == len(positions) or positions[i] != positions[i - 1] + 1:
+
+            run = (positions[start], positions[i - 1])
+            for position in positions[start:i]:
+                runs[position] = run
+            start = i
+
+    return runs
 
-    return False
 
 def merge_strands(strands):
+    """
+    Merges all strands that overlap or are adjacent, until no strands can be
+    merged anymore. The strands are merged with a union-find structure over
+    the strands, where two strands are united if they share a position or if
+    one of them contains the successor of a position of the other one.
+
+    :param strands: List of strands, each of which is a sequence of
+    consecutive positions.
+    :return: List of the merged strands as sets of positions.
+    """
+    parent = range(len(strands))
 
-    # first, map all strands to the set interface
-    strands = map(set, strands)
-    merge_complete = False
+    def find(i):
 
-    while not merge_complete:
+        # path halving
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
 
-        merge_complete = True
+    def union(i, j):
+        parent[find(i)] = find(j)
 
-        for (i, j) in combinations(range(len(strands)), 2):
+    # maps each position to a strand that contains it
+    owner = {}
 
-            if strands[i] & strands[j]\
-                    or min(strands[i]) - 1 == max(strands[j])\
-                    or min(strands[j]) - 1 == max(strands[i]):
+    for (i, strand) in enumerate(strands):
+        for position in strand:
 
-                merge_complete = False
+            if position in owner:
+                union(i, owner[position])
+            else:
+                owner[position] = i
 
-                strands.append(strands[i] | strands[j])
-                del strands[j]
-                del strands[i]
-                break
-    return strands
+    for position in owner:
+        if position + 1 in owner:
+            union(owner[position], owner[position + 1])
 
+    merged = defaultdict(set)
+    for (i, strand) in enumerate(strands):
+        merged[find(i)].update(strand)
 
-def join_strands(strands, hb_pairs, pdb_path):
+    return merged.values()
 
-    sheet_predictor = conf.sheet_predictor
-    strands = sorted(strands, key=lambda x:  np.mean(list(x)))
 
-    res = []
-    strand_added = False
+def strand_adjacency(strands, hydrogen_bonds):
+    """
+    Indexes which strands are connected by Hydrogen Bonds.
 
-    for strand in strands:
+    :param strands: List of disjoint strands.
+    :param hydrogen_bonds: HydrogenBondMatrix of the PDB file.
+    :return: List of the sets of the indices of all strands that each strand
+    forms a Hydrogen Bond with.
+    """
+    owner = {}
+    for (i, strand) in enumerate(strands):
+        for position in strand:
+            owner[position] = i
 
-        for sheet in res:
+    adjacency = [set() for _ in strands]
 
-            elem = sheet[-1]
-            if connected(elem[0], strand, hb_pairs):
+    for (i, strand) in enumerate(strands):
+        for position in strand:
+            for partner in hydrogen_bonds.partners(position):
 
-                # move elem[0] and strand to the feature space
-                X = sheet_encode(list(elem[0]), list(strand),
-                                 sheet_features, pdb_path)
+                if partner in owner:
+                    adjacency[i].add(owner[partner])
 
-                strand_orientation = sheet_predictor.predict(X)
-                sheet.append((strand, strand_orientation[0]))
-                strand_added = True
+    return adjacency
+
+
+def join_strands(strands, hydrogen_bonds, pdb_path):
+    """
+    Chains the strands to sheets and predicts the orientation of each strand
+    relative to its predecessor in the sheet.
+
+    The chaining only depends on the Hydrogen Bonds, so all sheets are
+    determined first. Then, the pairs of consecutive strands of all sheets
+    are encoded into a single matrix, whose orientations are predicted by a
+    single call of the sheet predictor.
+
+    :param strands: List of disjoint strands as sets of positions.
+    :param hydrogen_bonds: HydrogenBondMatrix of the PDB file.
+    :param pdb_path: Path to the PDB file.
+    :return: List of sheets, each of which is a list of pairs (strand,
+    orientation), where the first strand of a sheet has orientation 0.
+    """
+    strands = sorted(strands, key=lambda x:  np.mean(list(x)))
+
+    # strands that are connected by Hydrogen Bonds
+    adjacency = strand_adjacency(strands, hydrogen_bonds)
+
+    # indices of the strands of each sheet
+    chains = []
+
+    for index in xrange(len(strands)):
+
+        for chain in chains:
+
+            # the strand continues the first sheet whose last strand it
+            # forms a Hydrogen Bond with
+            if index in adjacency[chain[-1]]:
+                chain.append(index)
                 break
 
-        if strand_added:
-            strand_added = False
-            continue
         # strand could not be chained to another sheet, thus we introduce
         # a new sheet here
         else:
-            res.append([(strand, 0)])
-    return res
+            chains.append([index])
 
+    # each strand that continues a sheet is encoded with its predecessor
+    pairs = [(chain[i - 1], chain[i]) for chain in chains
+             for i in xrange(1, len(chain))]
 
+    orientations = {}
 
+    if pairs:
+        X = np.array([sheet_encode(list(strands[prev]), list(strands[index]),
+                                   sheet_features, pdb_path)
+                      for (prev, index) in pairs], dtype=np.float32)
 
+        orientations = dict(zip([index for (_, index) in pairs],
+                                conf.sheet_predictor.predict(X)))
 
+    return [[(strands[index], orientations.get(index, 0)) for index in chain]
+            for chain in chains]
@@ -0,0 +1,283 @@
+"""
+Training of the predictors. The predictors are fitted concurrently within a
+budget of cores, and the PDB files the predictors have been trained with are
+recorded in a manifest next to the pickled predictors, such that later runs
+only need to encode and learn the PDB files that have been added since.
+"""
+from __future__ import division
+from multiprocessing import Pool
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.conf import conf
+from src.learn.FeatureContext import FeatureContext
+from src.learn.binary_cache import file_digest
+from src.util import ForkPayload
+from feature_list import helix_features, strand_features, sheet_features
+
+# Names of the predictors, which are also the names of their files
+PREDICTORS = ['HELIX', 'STRAND', 'SHEET']
+
+# Name of the manifest in the directory of the predictors
+TRAINING_MANIFEST = 'TRAINING'
+
+# Directory of the training matrices and predictors of the current parallel
+# fit. The worker processes inherit them when they are forked, so they do not
+# have to be pickled.
+_fit = ForkPayload()
+
+
+def training_matrix(fc, name):
+    """
+    Constructs the training data of a predictor.
+
+    :param fc: Feature Context of the training PDB files.
+    :param name: Name of the predictor.
+    :return: X, Y as returned by the Feature Context.
+    """
+    if name == 'HELIX':
+        return fc.construct_window_matrix(helix_features,
+                                          conf.helix_assigner,
+                                          conf.helix_window_size)
+    elif name == 'STRAND':
+        return fc.construct_window_matrix(strand_features,
+                                          conf.strand_assigner,
+                                          conf.strand_window_size)
+    else:
+        return fc.construct_sheet_matrix(sheet_features)
+
+
+def fit_predictors(pdb_files, predictors, n_jobs):
+    """
+    Fits predictors to all PDB files, using at most `n_jobs` cores.
+
+    The training matrices of all predictors are constructed first, one
+    after the other, each by `n_jobs` worker processes, whether or not the
+    feature store is used. Each matrix is written to a temporary file in the
+    temp directory and released, so this process holds at most one matrix
+    at once. Then, each predictor is fitted by its own worker process, which
+    memory maps its matrix read-only instead of reading the PDB files again,
+    and uses the remaining cores of the budget for the fit itself, if the
+    predictor supports `n_jobs`. The mapped matrices are shared with the page
+    cache rather than copied into each process, but the memory the
+    predictors allocate while fitting is not bounded.
+
+    :param pdb_files: Paths of the training PDB files.
+    :param predictors: Dictionary, which maps the names of the predictors
+    (see `PREDICTORS`) to unfitted predictors.
+    :param n_jobs: Number of cores that may be used.
+    :return: Generator of the pairs (name, predictor) of the fitted
+    predictors, in the order in which they are completed.
+    """
+    names = [name for name in PREDICTORS if name in predictors]
+
+    if not os.path.exists(conf.temp_dir):
+        os.makedirs(conf.temp_dir)
+
+    directory = tempfile.mkdtemp(prefix='fit', dir=conf.temp_dir)
+
+    try:
+        # the PDB files are read once, the matrices are encoded by all cores
+        fc = FeatureContext(pdb_files, n_jobs=n_jobs)
+
+        for name in names:
+
+            X, Y = training_matrix(fc, name)
+            np.save(_matrix_path(directory, name, 'X'), X)
+            np.save(_matrix_path(directory, name, 'Y'), Y)
+            del X, Y
+
+        del fc
+
+        processes = max(1, min(n_jobs, len(names)))
+
+        # the cores are split among the processes, the window predictors
+        # come first and get the remaining cores, as their matrices are
+        # larger
+        jobs = [(name, n_jobs // processes +
+                 (1 if i < n_jobs % processes else 0))
+                for (i, name) in enumerate(names)]
+
+        if processes > 1:
+
+            with _fit.set((directory, predictors)):
+                pool = Pool(processes)
+
+            try:
+                for result in pool.imap_unordered(_run_fit, jobs):
+                    yield result
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for job in jobs:
+                yield _fit_predictor(job, directory, predictors)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _matrix_path(directory, name, matrix):
+
+    return directory + os.path.sep + name + '_' + matrix + '.npy'
+
+
+def _run_fit(job):
+
+    return _fit_predictor(job, *_fit.get())
+
+
+def _fit_predictor(job, directory, predictors):
+
+    (name, n_jobs) = job
+
+    predictor = predictors[name]
+    params = predictor.get_params()
+
+    if 'n_jobs' in params:
+        predictor.set_params(n_jobs=max(1, n_jobs))
+
+    # the matrices are mapped read-only, so the processes neither copy nor
+    # encode them
+    X = np.load(_matrix_path(directory, name, 'X'), mmap_mode='r')
+    Y = np.load(_matrix_path(directory, name, 'Y'), mmap_mode='r')
+    predictor.fit(X, Y)
+
+    # the pickled predictor should predict with the configured number of jobs
+    if 'n_jobs' in params:
+        predictor.set_params(n_jobs=params['n_jobs'])
+
+    return name, predictor
+
+
+def read_manifest(pred_dir):
+    """
+    Reads the manifest of the PDB files the predictors have been trained
+    with.
+
+    :param pred_dir: Directory of the predictors.
+    :return: Dictionary, which maps the digests of the contents of the PDB
+    files to their paths, or None if there is no manifest.
+    """
+    path = pred_dir + os.path.sep + TRAINING_MANIFEST
+
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        return dict(line.strip().split(' ', 1) for line in f if line.strip())
+
+
+def write_manifest(pred_dir, digests):
+    """
+    Writes the manifest of the PDB files the predictors have been trained
+    with.
+
+    :param pred_dir: Directory of the predictors.
+    :param digests: Dictionary, which maps the digests of the contents of the
+    PDB files to their paths. The paths are only recorded for information.
+    """
+    with open(pred_dir + os.path.sep + TRAINING_MANIFEST, 'w') as f:
+        for digest in sorted(digests):
+            f.write(digest + ' ' + digests[digest] + os.linesep)
+
+
+def trained_files(manifest, digests):
+    """
+    Locates the PDB files of a manifest, such that predictors can be fitted
+    to all PDB files they have been trained with again.
+
+    :param manifest: Dictionary, which maps the digests of the contents of
+    the PDB files to their paths, as returned by `read_manifest`.
+    :param digests: Dictionary, which maps the paths of the current PDB
+    files to the digests of their contents. PDB files of the manifest are
+    preferably taken from these paths.
+    :return: List of the paths of the PDB files of the manifest and list of
+    the recorded paths of the PDB files that are missing or have changed.
+    """
+    current = {digest: pdb for (pdb, digest) in digests.iteritems()}
+
+    found = []
+    missing = []
+
+    for digest in sorted(manifest):
+
+        if digest in current:
+            found.append(current[digest])
+
+        # the PDB file has to be at its recorded path, unchanged
+        elif os.path.exists(manifest[digest]) and \
+                file_digest(manifest[digest]) == digest:
+            found.append(manifest[digest])
+        else:
+            missing.append(manifest[digest])
+
+    return found, missing
+
+
+def added_trees(predictor, fraction):
+    """
+    Computes the number of estimators to add to an ensemble, such that the
+    new estimators make up a share of the ensemble that is proportional to
+    the new training data.
+
+    :param predictor: Fitted ensemble predictor.
+    :param fraction: Size of the new training data relative to the training
+    data the predictor has been fitted with.
+    :return: Number of estimators, at least 1.
+    """
+    return max(1, int(round(len(predictor.estimators_) * fraction)))
+
+
+def update_predictor(predictor, X, Y, n_trees):
+    """
+    Updates a fitted predictor with new training data, without fitting it to
+    the former training data again.
+
+    Predictors that support `partial_fit` learn the new training data this
+    way. Ensembles that support `warm_start` (for instance a RandomForest)
+    are extended by `n_trees` estimators, which are fitted to the new
+    training data only.
+
+    :param predictor: Fitted scikit-learn predictor.
+    :param X: Feature matrix of the new training data.
+    :param Y: Classes of the new training data.
+    :param n_trees: Number of estimators to add to an ensemble.
+    :return: Whether the predictor could be updated. Otherwise, it has to
+    be fitted to all training data again.
+    """
+    # there is nothing to learn
+    if not len(Y):
+        return True
+
+    classes = set(np.unique(Y))
+    params = predictor.get_params()
+
+    if hasattr(predictor, 'partial_fit'):
+
+        # the classes of a predictor are fixed by its first fit
+        if not classes <= set(predictor.classes_):
+            return False
+
+        predictor.partial_fit(X, Y, classes=predictor.classes_)
+        return True
+
+    if 'warm_start' in params and 'n_estimators' in params:
+
+        # the new estimators must predict the same classes as the former
+        # ones, as their predictions are combined
+        if classes != set(predictor.classes_):
+            return False
+
+        predictor.set_params(warm_start=True,
+                             n_estimators=len(predictor.estimators_) +
+                             n_trees)
+        predictor.fit(X, Y)
+
+        # a later fit of the predictor should not keep the estimators
+        predictor.set_params(warm_start=False)
+        return True
+
+    return False
@@ -0,0 +1,193 @@
+"""
+Compact representation of the backbone of a protein chain.
+
+All computations of the project only require the backbone atoms N, CA, C, O
+and H of the amino acids, together with their position, name and chain.
+A Backbone stores these in contiguous Numpy arrays instead of keeping the
+complete object graph of a BioPython Structure alive.
+
+The residues of a Backbone can be accessed via views, which provide the part
+of the BioPython Residue and Atom interface that is used within this project.
+Thus, a Backbone can be used wherever a Structure is expected by
+`src.pdb.extract.get_amino_acids`.
+"""
+import numpy as np
+
+from src.pdb.constants import AMINO_ACIDS, BACKBONE_ATOMS
+
+
+class Backbone(object):
+    """
+    Backbone of a protein chain. Coordinates of atoms that are not present
+    in the PDB file are set to NaN.
+    """
+
+    def __init__(self, coords, positions, resnames, chains, pdbid=None):
+        """
+        Creates new Backbone.
+
+        :param coords: Array of shape (n_res, 5, 3) with the coordinates of
+        the atoms N, CA, C, O and H of each residue.
+        :param positions: Positions of the residues in the AA sequence.
+        :param resnames: Three letter names of the residues.
+        :param chains: Chain identifiers of the residues.
+        :param pdbid: PDBID of the structure this backbone belongs to.
+        """
+        self.coords = np.ascontiguousarray(coords, dtype=np.float32)
+        self.positions = np.asarray(positions, dtype=np.int32)
+        self.resnames = np.asarray(resnames, dtype='S3')
+        self.chains = np.asarray(chains, dtype='S1')
+        self.pdbid = pdbid
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return self.get_residues()
+
+    def __getitem__(self, index):
+        return BackboneResidue(self, index)
+
+    @property
+    def nbytes(self):
+        """ Number of bytes occupied by the arrays of this backbone. """
+        return self.coords.nbytes + self.positions.nbytes + \
+            self.resnames.nbytes + self.chains.nbytes
+
+    @property
+    def present(self):
+        """ Boolean array of shape (n_res, 5) that tells whether an atom
+        of a residue is present. """
+        return ~np.isnan(self.coords[:, :, 0])
+
+    def get_residues(self):
+        """
+        Generates views on all residues of this backbone.
+
+        :return: Generator of BackboneResidue objects.
+        """
+        for index in xrange(len(self)):
+            yield BackboneResidue(self, index)
+
+
+class BackboneResidue(object):
+    """
+    View on a single residue of a Backbone.
+    """
+    __slots__ = ('backbone', 'index')
+
+    def __init__(self, backbone, index):
+
+        self.backbone = backbone
+        self.index = index
+
+    def get_id(self):
+        return ' ', int(self.backbone.positions[self.index]), ' '
+
+    def get_full_id(self):
+        return (self.backbone.pdbid, 0,
+                str(self.backbone.chains[self.index]), self.get_id())
+
+    def get_resname(self):
+        return str(self.backbone.resnames[self.index])
+
+    def has_id(self, name):
+        return name in BACKBONE_ATOMS and \
+            not np.isnan(self.backbone.coords[self.index,
+                                              BACKBONE_ATOMS.index(name), 0])
+
+    def __getitem__(self, name):
+
+        if not self.has_id(name):
+            raise KeyError(name)
+
+        return BackboneAtom(self, BACKBONE_ATOMS.index(name))
+
+    def get_unpacked_list(self):
+        """
+        Returns all present atoms of this residue in the order
+        N, CA, C, O, H.
+        """
+        present = ~np.isnan(self.backbone.coords[self.index, :, 0])
+        return [BackboneAtom(self, slot)
+                for slot in range(len(BACKBONE_ATOMS)) if present[slot]]
+
+    def add(self, atom):
+        """
+        Sets the coordinates of the backbone atom named like `atom`.
+
+        :param atom: Atom object, for instance a computed hydrogen.
+        """
+        name = atom.get_name().strip()
+
+        if name not in BACKBONE_ATOMS:
+            raise ValueError('Backbones cannot store atom ' + name)
+
+        self.backbone.coords[self.index, BACKBONE_ATOMS.index(name)] = \
+            atom.get_coord()
+
+
+class BackboneAtom(object):
+    """
+    View on a single atom of a BackboneResidue.
+    """
+    __slots__ = ('residue', 'slot')
+
+    def __init__(self, residue, slot):
+
+        self.residue = residue
+        self.slot = slot
+
+    def get_name(self):
+        return BACKBONE_ATOMS[self.slot]
+
+    def get_id(self):
+        return self.get_name()
+
+    def get_coord(self):
+        return self.residue.backbone.coords[self.residue.index, self.slot]
+
+    def get_vector(self):
+        from Bio.PDB import Vector
+
+        return Vector(self.get_coord())
+
+
+def from_structure(struc, chain='A'):
+    """
+    Extracts the Backbone of one chain of the first model of a BioPython
+    Structure object.
+
+    :param struc: Structure object as returned by BioPythons PDB file parser.
+    :param chain: Identifier of the chain to be extracted.
+    :return: Backbone of the chain.
+    """
+    coords = []
+    positions = []
+    resnames = []
+
+    model = next(iter(struc))
+
+    if chain in model:
+
+        for residue in model[chain]:
+
+            if residue.get_resname() not in AMINO_ACIDS:
+                continue
+
+            residue_coords = np.empty((len(BACKBONE_ATOMS), 3),
+                                      dtype=np.float32)
+            residue_coords.fill(np.nan)
+
+            for (slot, name) in enumerate(BACKBONE_ATOMS):
+                if name in residue:
+                    residue_coords[slot] = residue[name].get_coord()
+
+            coords.append(residue_coords)
+            positions.append(residue.get_id()[1])
+            resnames.append(residue.get_resname())
+
+    return Backbone(np.reshape(coords, (len(positions),
+                                        len(BACKBONE_ATOMS), 3)),
+                    positions, resnames, [chain] * len(positions),
+                    struc.get_id())
@@ -0,0 +1,154 @@
+"""
+Process-wide cache for parsed PDB files. Parsing a PDB file is by far the most
+expensive step of loading a structure, so each PDB file should only be parsed
+once, regardless of how many features, window extractors or annotators
+require the structure.
+"""
+import os
+from collections import OrderedDict
+
+from src.pdb.extract import read_pdb
+from src.util import get_id
+
+
+class StructureCache(object):
+    """
+    Least recently used cache of BioPython Structure objects and Backbones
+    together with the secondary structure annotation of the PDB file.
+
+    Entries are keyed by the absolute path and the modification time of the
+    PDB file, so a PDB file that changes on disk is parsed again. The size of
+    a Structure is approximated by the size of the PDB file in bytes, the
+    size of a Backbone is the size of its arrays. Least recently used entries
+    are evicted as soon as the summed size of all entries exceeds
+    `max_bytes`.
+
+    Structures and Backbones returned by the cache are shared, so callers
+    must not modify them.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Creates new empty cache.
+
+        :param max_bytes: Maximal summed size (in bytes) of the entries
+        that are kept in memory.
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+
+        # maps (path, mtime, kind) to (entry, size), ordered by last access
+        self._entries = OrderedDict()
+
+        # maps (path, kind) to the key of its current entry
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, pdb_path):
+        """
+        Returns the Structure object of the PDB file `pdb_path`. The file is
+        only parsed if it is not cached or if it has changed since it has
+        been parsed.
+
+        :param pdb_path: Path to the PDB file.
+        :return: BioPython Structure object of the PDB file.
+        """
+        return self._lookup(pdb_path, 'structure', _parse_structure)
+
+    def read(self, pdb_path, chain='A'):
+        """
+        Returns the secondary structure annotation and the Backbone of chain
+        `chain` of the PDB file `pdb_path`, as read by
+        `src.pdb.extract.read_pdb`. BioPython is not involved.
+
+        :param pdb_path: Path to the PDB file.
+        :param chain: Identifier of the chain.
+        :return: 4-tuple (helices, strands, sheets, backbone)
+        """
+        return self._lookup(pdb_path, 'read-' + chain,
+                            lambda path, size: _read(path, chain))
+
+    def get_backbone(self, pdb_path, chain='A'):
+        """
+        Returns the Backbone of chain `chain` of the PDB file `pdb_path`.
+
+        :param pdb_path: Path to the PDB file.
+        :param chain: Identifier of the chain.
+        :return: Backbone of the chain.
+        """
+        return self.read(pdb_path, chain)[3]
+
+    def _lookup(self, pdb_path, kind, load):
+        """
+        Returns cached entry of kind `kind` for PDB file `pdb_path`. The entry
+        is created with `load` if it is not cached yet.
+
+        :param load: Function which takes the path and the size of the PDB
+        file and returns the new entry together with its size.
+        """
+        path = os.path.abspath(pdb_path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime, kind)
+
+        if key in self._entries:
+
+            # reinsert entry to mark it as most recently used
+            entry = self._entries.pop(key)
+            self._entries[key] = entry
+            return entry[0]
+
+        entry, size = load(path, stat.st_size)
+        self._insert(key, entry, size)
+
+        return entry
+
+    def _insert(self, key, entry, size):
+        """
+        Adds new entry and evicts least recently used entries until the
+        cache does not exceed its maximal size. The new entry is never
+        evicted.
+        """
+        # an outdated version of this entry must not be kept
+        path_kind = (key[0], key[2])
+        if path_kind in self._keys:
+            self._remove(self._keys[path_kind])
+
+        self._entries[key] = (entry, size)
+        self._keys[path_kind] = key
+        self.bytes += size
+
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+
+        _, size = self._entries.pop(key)
+        del self._keys[(key[0], key[2])]
+        self.bytes -= size
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        self._entries.clear()
+        self._keys.clear()
+        self.bytes = 0
+
+
+def _read(path, chain):
+
+    entry = read_pdb(path, chain)
+    return entry, entry[3].nbytes
+
+
+def _parse_structure(path, size):
+
+    # BioPython is only imported if complete structures are required
+    from Bio.PDB import PDBParser
+
+    with open(path, 'r') as f:
+        struc = PDBParser().get_structure(get_id(path), f)
+
+    return struc, size
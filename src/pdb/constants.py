@@ -4,10 +4,15 @@ AMINO_ACIDS = ["ALA", "ARG", "ASN", "ASP", "CYS", "GLU", "GLN", "GLY", "HIS",
 
 NMR = 'nmr'
 
+# Atoms stored for each residue of a Backbone, in this order
+BACKBONE_ATOMS = ('N', 'CA', 'C', 'O', 'H')
+
 Q1 = 0.42
 Q2 = 0.20
 DIMENSIONAL_FACTOR = 332
 HBOND_THRESHOLD = -0.5  # kcal/mole
+HBOND_BLOCK_ELEMENTS = 1 << 20  # donor x acceptor pairs computed at once
+HBOND_MAX_ON_DISTANCE = 5.2  # Angstrom, between N and O of a hydrogen bond
 DERIVATION_H = 1e-3
 HNCA_ANGLE_DEG = 119
 NH_DISTANCE2 = 0.9409
@@ -4,15 +4,14 @@ the BioPython library.
 """
 
 __author__ = 'fillinger'
-import math
 import warnings
 from collections import defaultdict
 
-from Bio import BiopythonWarning, PDB
+from Bio import BiopythonWarning
+import numpy as np
 
-from src.pdb.hydrogen import validate
-from src.util import get_pos
-from src.pdb import constants
+from src.util import get_id
+from src.pdb import constants, backbone
 
 
 
@@ -31,6 +30,7 @@ def get_amino_acids(struc, positions=None, chain='A'):
     """
     Gets all amino acids of specified PDB file
     :param struc: Structure objects as returned by BioPythons PDB file parser
+    or Backbone
     :return: Generator of all Amino Acid residues of PDB file
     """
     for residue in struc.get_residues():
@@ -68,6 +68,28 @@ def get_secondary_structure_annotation(path):
     :return: a tuple of two lists of residue positions in [0]: helices
                                                           [1]: beta sheets
     """
+    record_helix_aa, record_strand_aa, record_sheets, _ = \
+        read_pdb(path, atoms=False)
+
+    return record_helix_aa, record_strand_aa, record_sheets
+
+
+def read_pdb(path, chain='A', atoms=True):
+    """
+    Reads the secondary structure annotation and the backbone of chain
+    `chain` of a PDB-file in a single pass over the file, where all records
+    are parsed by their fixed columns. Only the first model of the file is
+    considered and side chains, waters and hetero groups are skipped, so this
+    is considerably faster than parsing the file with BioPython.
+
+    :param path: the path to the pdb-file
+    :param chain: Identifier of the chain to be read.
+    :param atoms: Whether the ATOM records should be read. If not, only the
+    secondary structure annotation is read and the backbone is None.
+    :return: 4-tuple (helices, strands, sheets, backbone), where the first
+    three components are the same as for
+    `get_secondary_structure_annotation` and backbone is a Backbone object.
+    """
     # A list with residue positions in sheets
     record_strand_aa = []
     # A dictionary with helix types and corresponding positions
@@ -78,10 +100,67 @@ def get_secondary_structure_annotation(path):
     current_sheet = []
     strand_counter = 0
 
+    # residues of the backbone, maps residue id to the index of the residue
+    residue_index = {}
+    coords = []
+    occupancies = []
+    positions = []
+    resnames = []
+
     with open(path, 'r') as pdb_file:
         for line in pdb_file:
+
+            # if line provides an ATOM information
+            if line.startswith("ATOM") or line.startswith("HETATM"):
+
+                if not atoms or line[21:22] != chain \
+                        or line[17:20] not in constants.AMINO_ACIDS:
+                    continue
+
+                # identify residue by hetero flag, sequence number and
+                # insertion code
+                position = int(line[22:26])
+                res_id = (line[0], position, line[26:27])
+
+                if res_id not in residue_index:
+
+                    residue_index[res_id] = len(positions)
+                    coords.append(np.empty((len(constants.BACKBONE_ATOMS), 3),
+                                           dtype=np.float32))
+                    coords[-1].fill(np.nan)
+                    occupancies.append([None] * len(constants.BACKBONE_ATOMS))
+                    positions.append(position)
+                    resnames.append(line[17:20])
+
+                name = line[12:16].strip()
+
+                if name not in constants.BACKBONE_ATOMS:
+                    continue
+
+                index = residue_index[res_id]
+                slot = constants.BACKBONE_ATOMS.index(name)
+
+                # of alternative locations, keep the first location with
+                # the highest occupancy like BioPython does
+                try:
+                    occupancy = float(line[54:60])
+                except ValueError:
+                    occupancy = 0.0
+
+                if occupancies[index][slot] is None \
+                        or occupancy > occupancies[index][slot]:
+
+                    occupancies[index][slot] = occupancy
+                    coords[index][slot] = (float(line[30:38]),
+                                           float(line[38:46]),
+                                           float(line[46:54]))
+
+            # only the first model is considered
+            elif line.startswith("ENDMDL"):
+                break
+
             # if line provides a HELIX information
-            if line.startswith("HELIX") and "A" in line[19]:
+            elif line.startswith("HELIX") and line[19:20] == chain:
                 # we want only the residues of one chain to avoid duplicates
                 # extract helix class
 
@@ -91,7 +170,7 @@ def get_secondary_structure_annotation(path):
                                                      int(line[33:37]) + 1))
 
             # if line provides a SHEET information
-            elif line.startswith("SHEET") and "A" in line[21]:
+            elif line.startswith("SHEET") and line[21:22] == chain:
                 # if line provides a SHEET information
                 start_res = int(line[22:26])  # the start residue of a sheet
                 term_res = int(line[33:37])  # the terminating res. of a sheet
@@ -120,84 +199,123 @@ def get_secondary_structure_annotation(path):
                     record_sheets.append(list(current_sheet))
                     current_sheet = []
 
-    return record_helix_aa, record_strand_aa, record_sheets
+    if not atoms:
+        return record_helix_aa, record_strand_aa, record_sheets, None
+
+    bb = backbone.Backbone(np.reshape(coords, (len(positions),
+                                               len(constants.BACKBONE_ATOMS),
+                                               3)),
+                           positions, resnames, [chain] * len(positions),
+                           get_id(path))
+
+    return record_helix_aa, record_strand_aa, record_sheets, bb
 
 
-def compute_torsion_angles(previous_residue, residue, next_residue):
+def dihedral_angles(p0, p1, p2, p3):
     """
-    Little helper function, calculates the backbone phi and psi torsion
-    angles from the given residues and returns them
-    :param residue: The amino acid residue the torsion angles shall be computed
-    :return: Phi and psi backbone torsion angles
+    Computes the dihedral angles of many quadruples of points at once, with
+    the same sign convention as `Bio.PDB.calc_dihedral`.
+
+    :param p0: Array of shape (n, 3) with the first points.
+    :param p1: Array of shape (n, 3) with the second points.
+    :param p2: Array of shape (n, 3) with the third points.
+    :param p3: Array of shape (n, 3) with the fourth points.
+    :return: Array of the n dihedral angles in degrees. Angles of quadruples
+    with missing (NaN) points are NaN.
     """
-    # print previous_residue.get_id()[1], residue.get_id()[1], next_residue.get_id()[1]
-    # extract the atoms for the torsion calculation
-    # 1.) for the phi
-    atom_CO_0 = previous_residue['C'].get_vector()
-    atom_N_1 = residue['N'].get_vector()
-    atom_CA_1 = residue['CA'].get_vector()
-    atom_CO_1 = residue['C'].get_vector()
-    atom_N_2 = next_residue['N'].get_vector()
+    b0 = p0 - p1
+    b1 = p2 - p1
+    b2 = p3 - p2
+
+    # normals of the planes (p0, p1, p2) and (p1, p2, p3)
+    n0 = np.cross(b0, b1)
+    n1 = np.cross(b2, b1)
+
+    # orthonormal frame of the first plane
+    m = np.cross(n0, b1 / np.linalg.norm(b1, axis=1)[:, np.newaxis])
 
-    phi_angle = PDB.calc_dihedral(atom_CO_0, atom_N_1, atom_CA_1, atom_CO_1)
-    psi_angle = PDB.calc_dihedral(atom_N_1, atom_CA_1, atom_CO_1, atom_N_2)
+    x = np.einsum('ij,ij->i', n0, n1)
+    y = np.einsum('ij,ij->i', m, n1)
 
-    # convert into degrees
-    return math.degrees(phi_angle), math.degrees(psi_angle)
+    return -np.degrees(np.arctan2(y, x))
 
 
-def get_backbone_torsion_angles(generator_aa):
+def get_backbone_torsion_angles(bb, chain='A'):
     """
-    Calculates the backbone torsion angles for annotated alpha-helices and
-    beta-sheets from a Generator with all amino acid residues from a PDB-file
-    :param generator_aa: Generator with extracted amino acid residues from the
-    PDB-file
-    :return: Two lists of tuples, containing the phi and psi torsion angles
-    for alpha-helices and beta-sheets
+    Calculates the backbone torsion angles of the amino acids of a Backbone
+    in one pass.
+
+    The angles are those of the former walk over the amino acids with a
+    window of the previous, the current and the next amino acid: the angles
+    of each amino acid are stored at the position of the next amino acid,
+    except for the first amino acid, which is its own predecessor and whose
+    angles are stored at its own position. The neighbours are those in the
+    order of the chain, regardless of chain breaks. No angles are stored if
+    any of the three amino acids is not valid, i.e. has not more than three
+    backbone atoms (see `src.pdb.hydrogen.validate`).
+
+    :param bb: Backbone of the protein chain.
+    :param chain: Identifier of the chain of the amino acids.
+    :return: Dictionary which maps positions to the tuple (phi, psi) of
+    torsion angles in degrees. Positions without torsion angles map to
+    (0, 0).
     """
     torsion_angles = defaultdict(lambda: (0, 0))
 
-    previous_residue = 0
-    for residue in generator_aa:
-        if previous_residue == 0:
-            previous_residue = residue
-            curr_residue = residue
-            next_residue = generator_aa.next()
-        else:
-            previous_residue = curr_residue
-            curr_residue = next_residue
-            next_residue = residue
-
-        chain = residue.get_full_id()[2]
-        if chain is not 'A':
-            break
-
-        # get position of residue and map it to the annotated torsion angle
-        pos = get_pos(residue)
-
-        # validate all amino acidss
-        if not validate(previous_residue) or not validate(curr_residue)\
-                or not validate(next_residue):
-            continue
+    # the same amino acids as those of `get_amino_acids`
+    index = np.flatnonzero((bb.chains == chain) &
+                           np.in1d(bb.resnames, constants.AMINO_ACIDS))
+    n = len(index)
+
+    if n < 2:
+        return torsion_angles
+
+    coords = bb.coords[index].astype(np.float64)
+    positions = bb.positions[index]
+    valid = np.sum(bb.present[index], axis=1) > 3
+
+    nitrogen = coords[:, 0]
+    calpha = coords[:, 1]
+    carbon = coords[:, 2]
+
+    # the previous, the current and the next amino acid of each window,
+    # the last amino acid has no next one
+    current = np.arange(n - 1)
+    previous = np.maximum(current - 1, 0)
+    following = current + 1
+
+    phi = dihedral_angles(carbon[previous], nitrogen[current],
+                          calpha[current], carbon[current])
+    psi = dihedral_angles(nitrogen[current], calpha[current],
+                          carbon[current], nitrogen[following])
+
+    target = positions[following]
+    target[0] = positions[0]
+
+    complete = valid[previous] & valid[current] & valid[following]
+
+    # later amino acids of the same position (insertion codes) replace the
+    # angles of the former ones
+    for (pos, phi_angle, psi_angle) in zip(target[complete].tolist(),
+                                           phi[complete].tolist(),
+                                           psi[complete].tolist()):
+        torsion_angles[pos] = (phi_angle, psi_angle)
 
-        torsion_angles[pos] = compute_torsion_angles(previous_residue,
-                                                     curr_residue,
-                                                     next_residue)
     return torsion_angles
 
 
 if __name__ == "__main__":
+    from Bio import PDB
     # test file
     pdb_file = "/home/sven/Git/bioinformatics2/assignment_2/pdb/1SMC.pdb"
     #pdb_file = "/home/fillinger/git/bioinformatics2/assignment_2/pdb/3PSD.pdb"
     struct = PDB.PDBParser().get_structure("test", pdb_file)
-    residues = get_amino_acids(struct)
     # example: print the residues that are in helices
     structure_positions = get_secondary_structure_annotation(pdb_file)
     print structure_positions[0][1]
     # res = get_backbone_torsion_angles(residues, structure_positions[0][1],
     #                                  structure_positions[1])
-    res = get_backbone_torsion_angles(residues)
+    res = get_backbone_torsion_angles(backbone.from_structure(struct))
     # alpha helices torsions
     for angles in res[0]:
         print angles[0], ":", angles[1]
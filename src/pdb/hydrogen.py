@@ -6,23 +6,47 @@ in account, which are described in [1].
 """
 from __future__ import division
 
-from Bio.PDB import Atom
 import numpy as np
-from scipy.optimize import fmin_slsqp
 
 from src.pdb.constants import NH_DISTANCE, NH_DISTANCE2, HNCA_ANGLE_DEG
 from src.util import window, angle
 import extract
 from src.geometry import Plane
+from src.pdb.backbone import Backbone
+
+
+# Modes of computing the hydrogen positions
+ANALYTIC = 'analytic'
+OPTIMIZE = 'optimize'
 
 
 class StructureHydrogenAdder(object):
 
-    def __init__(self, struc):
+    def __init__(self, struc, mode=ANALYTIC):
+        """
+        :param struc: BioPython Structure object or Backbone to which the
+        hydrogens should be added. A Backbone is copied, as Backbones are
+        shared by the structure cache.
+        :param mode: Either ANALYTIC, where the hydrogens of all residues
+        are placed at once in closed form, or OPTIMIZE, where the position of
+        each hydrogen is optimized with SLSQP.
+        """
+        if mode not in (ANALYTIC, OPTIMIZE):
+            raise ValueError("Unrecognized mode to compute hydrogens.")
 
         self.struc = struc
+        self.mode = mode
+
+        # Backbones are copied, since the structure cache shares them, and
+        # do not keep track of atom serial numbers
+        if isinstance(struc, Backbone):
+            self.struc = Backbone(struc.coords.copy(), struc.positions,
+                                  struc.resnames, struc.chains, struc.pdbid)
+            self._atom_max_serial_number = 0
+        else:
+            self._atom_max_serial_number = \
+                extract.get_atom_max_serial_number(struc)
 
-        self._atom_max_serial_number = extract.get_atom_max_serial_number(struc)
         self._current_atom_serial_number = self._atom_max_serial_number
 
     def _next_atom_serial(self):
@@ -51,13 +75,37 @@ class StructureHydrogenAdder(object):
         """
         Adds all missing hydrogen to this structure.
         """
+        if isinstance(self.struc, Backbone) and self.mode == ANALYTIC:
+            self._supplement_backbone()
+            return
+
+        # add hydrogen to residue, i.e. aa2
+        # only compute hydrogen if there is not already a hydrogen defined
+        pairs = [(aa1, aa2) for (aa1, aa2) in self._aa_window(2)
+                 if not _contains_hydrogen(aa2)]
+
+        for ((_, aa2), hydrogen) in zip(pairs, self._compute_hydrogens(pairs)):
+            aa2.add(hydrogen)
+
+    def _supplement_backbone(self):
+        """
+        Adds all missing hydrogens to the Backbone with a single array
+        operation.
+        """
+        coords = self.struc.coords
+        present = self.struc.present
 
-        for (aa1, aa2) in self._aa_window(2):
+        # residues with complete N, CA, C, O backbone
+        valid = np.all(present[:, :4], axis=1)
 
-            # add hydrogen to residue, i.e. aa2
-            # only compute hydrogen if there is not already a hydrogen defined
-            if not _contains_hydrogen(aa2):
-                aa2.add(self._compute_hydrogen(aa1, aa2))
+        # indices of all residues that need a hydrogen and whose
+        # predecessor is valid
+        index = np.nonzero(valid[:-1] & valid[1:] & ~present[1:, 4])[0] + 1
+
+        coords[index, 4] = place_hydrogens(coords[index - 1, 2],
+                                           coords[index - 1, 3],
+                                           coords[index, 0],
+                                           coords[index, 1])
 
     def backbone(self):
         """
@@ -72,13 +120,41 @@ class StructureHydrogenAdder(object):
 
         # uses a sliding window approach to generate all consecutive
         # tuples of amino acids
-        for (aa1, aa2) in self._aa_window(2):
+        pairs = list(self._aa_window(2))
 
-            # compute explicit hydrogen of aa2
-            aa2_hydrogen = self._compute_hydrogen(aa1, aa2)
+        # compute explicit hydrogens of the second amino acids
+        for ((_, aa2), aa2_hydrogen) in zip(pairs,
+                                            self._compute_hydrogens(pairs)):
 
             yield (aa2_hydrogen, aa2.get_full_id())
 
+    def _compute_hydrogens(self, pairs):
+        """
+        Computes the explicit hydrogens of the second amino acid of all
+        `pairs` of consecutive amino acids with the mode of this instance.
+
+        :param pairs: List of pairs (aa1, aa2) of consecutive amino acids.
+        :return: List of Atom objects of the hydrogens.
+        """
+        if self.mode == OPTIMIZE:
+            return [self._compute_hydrogen(aa1, aa2) for (aa1, aa2) in pairs]
+
+        if not pairs:
+            return []
+
+        coords = place_hydrogens(*_pair_coordinates(pairs))
+
+        return [self._hydrogen_atom(coord) for coord in coords]
+
+    def _hydrogen_atom(self, coord):
+        """
+        Creates Atom instance of a computed Hydrogen.
+        """
+        from Bio.PDB import Atom
+
+        return Atom.Atom('H', coord, 0, 1, ' ', ' H  ',
+                         self._next_atom_serial(), 'H')
+
     def _compute_hydrogen(self, aa1, aa2):
         """
         Computes the explicit hydrogen (actually only the coordinates) of
@@ -165,6 +241,9 @@ class StructureHydrogenAdder(object):
             return np.power(angle(vec1(x, y, z), vec2, deg=True)
                             - HNCA_ANGLE_DEG, 2)
 
+        # SciPy is only imported if hydrogens are actually optimized
+        from scipy.optimize import fmin_slsqp
+
         res = fmin_slsqp(lambda q: target(q[0], q[1], q[2]),
                          x0=hydrogen,
                          eqcons=[lambda q: on_plane(q[0], q[1], q[2]),
@@ -175,8 +254,121 @@ class StructureHydrogenAdder(object):
                          iter=1000)
 
         # create Atom instance of computed Hydrogen and return
-        return Atom.Atom('H', res, 0, 1, ' ', ' H  ',
-                         self._next_atom_serial(), 'H')
+        return self._hydrogen_atom(res)
+
+
+def place_hydrogens(carbon, oxygen, nitrogen, calpha):
+    """
+    Computes the explicit backbone hydrogens of many amino acids at once
+    in closed form. Each hydrogen lies on the plane through the oxygen and
+    carbon of the previous amino acid and the nitrogen, has the distance
+    NH_DISTANCE to the nitrogen and encloses the angle HNCA_ANGLE_DEG
+    with the calpha. Of the two solutions, the one with the larger distance
+    to the oxygen is taken. This is the solution which is found by the
+    optimization of `StructureHydrogenAdder._compute_hydrogen`.
+
+    If the angle cannot be attained exactly on the plane, the hydrogen is
+    placed such that the angle is as close as possible to HNCA_ANGLE_DEG.
+
+    :param carbon: Array (n, 3) of the carbons of the previous amino acids.
+    :param oxygen: Array (n, 3) of the oxygens of the previous amino acids.
+    :param nitrogen: Array (n, 3) of the nitrogens of the amino acids.
+    :param calpha: Array (n, 3) of the calphas of the amino acids.
+    :return: Array (n, 3) of the coordinates of the hydrogens.
+    """
+    carbon = np.asarray(carbon, dtype=np.float64)
+    oxygen = np.asarray(oxygen, dtype=np.float64)
+    nitrogen = np.asarray(nitrogen, dtype=np.float64)
+    calpha = np.asarray(calpha, dtype=np.float64)
+
+    # normal vector of the plane through oxygen, carbon and nitrogen
+    normal = _unit(np.cross(carbon - oxygen, carbon - nitrogen))
+
+    # project vector from nitrogen to calpha onto the plane
+    vec = calpha - nitrogen
+    vec_plane = vec - np.einsum('ij,ij->i', vec, normal)[:, np.newaxis] \
+        * normal
+
+    # angle between the hydrogen and the projected vector, such that the
+    # angle to the actual vector is HNCA_ANGLE_DEG
+    cos = np.cos(np.radians(HNCA_ANGLE_DEG)) * _norm(vec) / _norm(vec_plane)
+    cos = np.clip(cos, -1, 1)[:, np.newaxis]
+    sin = np.sqrt(1 - np.power(cos, 2))
+
+    # orthonormal base of the plane
+    u = _unit(vec_plane)
+    w = np.cross(normal, u)
+
+    candidate1 = nitrogen + NH_DISTANCE * (cos * u + sin * w)
+    candidate2 = nitrogen + NH_DISTANCE * (cos * u - sin * w)
+
+    # decide for candidate which maximizes distance to oxygen
+    farther = _norm(candidate1 - oxygen) >= _norm(candidate2 - oxygen)
+
+    return np.where(farther[:, np.newaxis], candidate1, candidate2)
+
+
+def compare_placement(struc):
+    """
+    Compares the hydrogens placed in ANALYTIC mode with the hydrogens
+    placed in OPTIMIZE mode for all residues of `struc`.
+
+    :param struc: BioPython Structure object or Backbone.
+    :return: 3-tuple of arrays (distances, angles_analytic, angles_optimize),
+    where distances are the distances between the hydrogens of both modes
+    and the angles are the HNCA angles in degrees of both modes.
+    """
+    pairs = list(StructureHydrogenAdder(struc)._aa_window(2))
+
+    if not pairs:
+        return np.empty(0), np.empty(0), np.empty(0)
+
+    (carbon, oxygen, nitrogen, calpha) = _pair_coordinates(pairs)
+
+    analytic = place_hydrogens(carbon, oxygen, nitrogen, calpha)
+    optimize = np.array([atom.get_coord() for atom in
+                         StructureHydrogenAdder(struc, OPTIMIZE)
+                         ._compute_hydrogens(pairs)], dtype=np.float64)
+
+    return (_norm(analytic - optimize),
+            _hnca_angles(analytic, nitrogen, calpha),
+            _hnca_angles(optimize, nitrogen, calpha))
+
+
+def _pair_coordinates(pairs):
+    """
+    Extracts the coordinates of the atoms that determine the hydrogen of
+    the second amino acid for all pairs of consecutive amino acids.
+
+    :return: 4-tuple of arrays (carbon, oxygen, nitrogen, calpha)
+    """
+    atoms = [(aa1.get_unpacked_list(), aa2.get_unpacked_list())
+             for (aa1, aa2) in pairs]
+
+    return (np.array([atoms1[2].get_coord() for (atoms1, _) in atoms]),
+            np.array([atoms1[3].get_coord() for (atoms1, _) in atoms]),
+            np.array([atoms2[0].get_coord() for (_, atoms2) in atoms]),
+            np.array([atoms2[1].get_coord() for (_, atoms2) in atoms]))
+
+
+def _hnca_angles(hydrogen, nitrogen, calpha):
+
+    vec1 = hydrogen - np.asarray(nitrogen, dtype=np.float64)
+    vec2 = np.asarray(calpha, dtype=np.float64) - nitrogen
+
+    return np.degrees(np.arccos(np.einsum('ij,ij->i', vec1, vec2) /
+                                (_norm(vec1) * _norm(vec2))))
+
+
+def _norm(vectors):
+
+    return np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+
+
+def _unit(vectors):
+
+    return vectors / _norm(vectors)[:, np.newaxis]
+
 
 def validate(aa):
     """
@@ -5,12 +5,14 @@ any other module.
 from __future__ import division
 from itertools import islice
 from collections import defaultdict
+from contextlib import contextmanager
 import getopt
 import re
 import sys
 import os
 
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 
 from src.pdb.constants import RE_PDBID
 
@@ -27,6 +29,73 @@ def window(seq, n=2):
         result = result[1:] + (elem,)
         yield result
 
+
+def sliding_windows(encoding, window_size):
+    """
+    Creates a read-only view on the windows of encoded residues, without
+    copying the encodings.
+
+    :param encoding: C-contiguous array of shape (n_res, k) with the
+    encoding of each residue.
+    :param window_size: Number of residues of a window.
+    :return: Array of shape (n_res - window_size + 1, window_size * k),
+    whose rows are the concatenated encodings of the residues of each
+    window.
+    """
+    (n, k) = encoding.shape
+    n = max(0, n - window_size + 1)
+
+    view = as_strided(encoding, shape=(n, window_size * k),
+                      strides=(encoding.strides[0], encoding.strides[1]))
+    view.flags.writeable = False
+
+    return view
+
+
+class ForkPayload(object):
+    """
+    Payload of the worker processes of a multiprocessing Pool. The workers
+    inherit it when they are forked, so the payload, which may hold large
+    arrays or unpicklable functions, does not have to be pickled.
+
+    The payload is only set while the pool is created, as its workers are
+    forked at that point:
+
+        with payload.set(value):
+            pool = Pool(n_jobs)
+
+    Thus, a generator that consumes the pool and is abandoned does not keep
+    the payload alive, and nested or interleaved pools of the same payload
+    do not overwrite each other's value. Workers read the value with `get`.
+    """
+
+    def __init__(self):
+        self._value = None
+
+    @contextmanager
+    def set(self, value):
+        """
+        Sets the payload to `value` and restores the previous payload on exit.
+
+        :param value: Payload of the workers forked within this context.
+        """
+        previous = self._value
+        self._value = value
+        try:
+            yield
+        finally:
+            self._value = previous
+
+    def get(self):
+        """
+        :return: Payload that has been set when this process was forked.
+        """
+        if self._value is None:
+            raise RuntimeError("No payload has been set for this process.")
+
+        return self._value
+
+
 def angle(vec1, vec2, deg=True):
     """
     Computes angle between vec1 and vec2. Vectors must have the same
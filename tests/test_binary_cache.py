@@ -0,0 +1,139 @@
+"""
+Checks that cache files are only used for the unchanged PDB file they have
+been computed from.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.learn.binary_cache import read_cache, write_cache
+from src.learn.HydrogenBondCache import HydrogenBondCache
+
+CONTENT = 'ATOM      1  N   MET A   1      27.340  24.430   2.614\n'
+
+
+class BinaryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.pdb_path = os.path.join(self.directory, '1ABC.pdb')
+        self.cache_path = os.path.join(self.directory, '1ABC.hbb')
+
+        self.pairs = np.array([[1, 5], [2, 9]], dtype=np.int32)
+        self.energies = np.array([[-1.5, 0], [0, -0.75]], dtype=np.float32)
+
+        self.write_pdb(CONTENT, 1000000000)
+        write_cache(self.cache_path, 'hbond', self.pdb_path,
+                    [('pairs', self.pairs), ('energies', self.energies)],
+                    {'min_seq_distance': 2})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_pdb(self, content, mtime):
+
+        with open(self.pdb_path, 'w') as f:
+            f.write(content)
+
+        os.utime(self.pdb_path, (mtime, mtime))
+
+    def read(self, kind='hbond', parameters=None):
+
+        return read_cache(self.cache_path, kind, self.pdb_path,
+                          parameters or {'min_seq_distance': 2})
+
+    def test_valid(self):
+
+        arrays = self.read()
+
+        self.assertTrue(np.array_equal(arrays['pairs'], self.pairs))
+        self.assertTrue(np.array_equal(arrays['energies'], self.energies))
+
+    def test_parameters(self):
+
+        self.assertIsNone(self.read(kind='other'))
+        self.assertIsNone(self.read(parameters={'min_seq_distance': 3}))
+
+    def test_missing(self):
+
+        os.remove(self.cache_path)
+        self.assertIsNone(self.read())
+
+    def test_mtime_changed(self):
+
+        # the content is compared by its SHA1, if only the time changes
+        self.write_pdb(CONTENT, 1000000100)
+        self.assertIsNotNone(self.read())
+
+    def test_size_changed(self):
+
+        self.write_pdb(CONTENT + CONTENT, 1000000000)
+        self.assertIsNone(self.read())
+
+    def test_content_changed(self):
+
+        self.write_pdb(CONTENT.replace('MET', 'GLY'), 1000000100)
+        self.assertIsNone(self.read())
+
+    def test_not_a_cache_file(self):
+
+        with open(self.cache_path, 'w') as f:
+            f.write('1 5 -1.5 0\n')
+
+        self.assertIsNone(self.read())
+
+
+class HydrogenBondCacheTest(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.pdb_path = os.path.join(self.directory, '1ABC.pdb')
+
+        with open(self.pdb_path, 'w') as f:
+            f.write(CONTENT)
+
+        os.utime(self.pdb_path, (1000000000, 1000000000))
+
+        self.pairs = np.array([[1, 5]], dtype=np.int32)
+        self.energies = np.array([[-1.5, 0]], dtype=np.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_get(self):
+
+        cache = HydrogenBondCache(os.path.join(self.directory, 'temp'))
+
+        self.assertIsNone(cache.get(self.pdb_path, 2))
+
+        cache.put(self.pdb_path, 2, self.pairs, self.energies)
+        (pairs, energies) = cache.get(self.pdb_path, 2)
+
+        self.assertTrue(np.array_equal(pairs, self.pairs))
+        self.assertTrue(np.array_equal(energies, self.energies))
+        self.assertIsNone(cache.get(self.pdb_path, 3))
+
+        # a new cache finds the files that have been written by another one
+        self.assertIsNotNone(HydrogenBondCache(cache.directory)
+                             .get(self.pdb_path, 2))
+
+    def test_changed_pdb_file(self):
+
+        cache = HydrogenBondCache(self.directory)
+        cache.put(self.pdb_path, 2, self.pairs, self.energies)
+
+        with open(self.pdb_path, 'w') as f:
+            f.write(CONTENT.replace('MET', 'GLY'))
+
+        os.utime(self.pdb_path, (1000000100, 1000000100))
+
+        self.assertIsNone(cache.get(self.pdb_path, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Compares the HydrogenBondMatrix with the potential map, the dictionary from
+pairs of positions to both potentials, that was used to represent Hydrogen
+Bonds before.
+"""
+import unittest
+
+import numpy as np
+
+from src.learn.HydrogenBondMatrix import arrays_from_map, matrix_from_arrays
+
+
+def random_chain(rng, n_res=60, n_bonds=150):
+    """
+    Creates the positions of a chain with gaps and a random potential map,
+    whose first residue of each pair precedes the second one in the chain.
+    """
+    positions = np.cumsum(rng.choice([1, 1, 1, 2, 5], n_res)).tolist()
+    potential_map = {}
+
+    for _ in xrange(n_bonds):
+
+        (i, j) = sorted(rng.choice(n_res, 2, replace=False))
+
+        # the potentials are float32 values, like in the cache files
+        potentials = [float(np.float32(pot)) for pot in
+                      rng.choice([0, -0.6, -1.5]) * rng.rand(2)]
+
+        if any(potentials):
+            potential_map[(positions[i], positions[j])] = tuple(potentials)
+
+    return positions, potential_map
+
+
+def old_partners(potential_map, position):
+    """
+    Partners of a residue as found by scanning the potential map. The
+    potentials of bonds with a preceding residue are swapped, such that they
+    are seen from the residue at `position`.
+    """
+    partners = {}
+
+    for ((left, right), potentials) in potential_map.items():
+
+        if left == position:
+            partners[right] = potentials
+        elif right == position:
+            partners[left] = potentials[::-1]
+
+    return partners
+
+
+class HydrogenBondMatrixTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = np.random.RandomState(0)
+
+    def test_partners(self):
+
+        for _ in xrange(20):
+
+            (positions, potential_map) = random_chain(self.rng)
+            matrix = matrix_from_arrays(positions,
+                                        *arrays_from_map(potential_map))
+
+            for position in positions + [-1, positions[-1] + 1]:
+                self.assertEqual(matrix.partners(position),
+                                 old_partners(potential_map, position))
+
+    def test_pairs(self):
+
+        for _ in xrange(20):
+
+            (positions, potential_map) = random_chain(self.rng)
+            matrix = matrix_from_arrays(positions,
+                                        *arrays_from_map(potential_map))
+
+            self.assertEqual(len(matrix), len(potential_map))
+            self.assertEqual(matrix.pairs(), sorted(potential_map))
+
+    def test_band(self):
+
+        for width in [1, 4, 8]:
+
+            (positions, potential_map) = random_chain(self.rng)
+            matrix = matrix_from_arrays(positions,
+                                        *arrays_from_map(potential_map))
+
+            band = matrix.band(width)
+
+            self.assertEqual(band.shape, (len(positions), width, 2))
+
+            for (row, position) in enumerate(positions):
+                for distance in xrange(1, width + 1):
+                    self.assertEqual(
+                        tuple(band[row, distance - 1].tolist()),
+                        potential_map.get((position, position + distance),
+                                          (0, 0)))
+
+    def test_connected(self):
+
+        (positions, potential_map) = random_chain(self.rng)
+        matrix = matrix_from_arrays(positions, *arrays_from_map(potential_map))
+
+        for _ in xrange(100):
+
+            positions1 = self.rng.choice(positions, 3).tolist()
+            positions2 = self.rng.choice(positions, 3).tolist()
+
+            expected = any((c, d) in potential_map or (d, c) in potential_map
+                           for c in positions1 for d in positions2)
+
+            self.assertEqual(matrix.connected(positions1, positions2),
+                             expected)
+
+    def test_empty(self):
+
+        matrix = matrix_from_arrays([1, 2, 3], *arrays_from_map({}))
+
+        self.assertEqual(len(matrix), 0)
+        self.assertEqual(matrix.pairs(), [])
+        self.assertEqual(matrix.partners(2), {})
+        self.assertFalse(np.any(matrix.band(2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Compares the strand runs and the merging of strands with the algorithms
+that were used by the sheet prediction before.
+"""
+from itertools import combinations
+import unittest
+
+import numpy as np
+
+from src.learn.sheets import merge_strands, strand_runs
+
+
+def old_extend(position, strand_positions):
+    """
+    Extends a strand position to the left and to the right as long as the
+    positions are strand positions.
+    """
+    (left, right) = (position, position)
+
+    while True:
+
+        if left - 1 in strand_positions:
+            left -= 1
+            continue
+
+        if right + 1 in strand_positions:
+            right += 1
+            continue
+        break
+
+    return left, right
+
+
+def old_merge_strands(strands):
+    """
+    Merges strands pairwise until no pair of strands overlaps or is adjacent.
+    """
+    strands = map(set, strands)
+    merge_complete = False
+
+    while not merge_complete:
+
+        merge_complete = True
+
+        for (i, j) in combinations(range(len(strands)), 2):
+
+            if strands[i] & strands[j]\
+                    or min(strands[i]) - 1 == max(strands[j])\
+                    or min(strands[j]) - 1 == max(strands[i]):
+
+                merge_complete = False
+
+                strands.append(strands[i] | strands[j])
+                del strands[j]
+                del strands[i]
+                break
+    return strands
+
+
+class StrandRunsTest(unittest.TestCase):
+
+    def test_runs(self):
+
+        rng = np.random.RandomState(0)
+
+        for _ in xrange(50):
+
+            strand_positions = rng.choice(100, rng.randint(1, 80)).tolist()
+            runs = strand_runs(strand_positions)
+
+            self.assertEqual(set(runs), set(strand_positions))
+
+            for position in strand_positions:
+                self.assertEqual(runs[position],
+                                 old_extend(position, strand_positions))
+
+    def test_empty(self):
+
+        self.assertEqual(strand_runs([]), {})
+
+
+class MergeStrandsTest(unittest.TestCase):
+
+    def assertMerged(self, strands):
+
+        self.assertEqual(sorted(map(sorted, merge_strands(strands))),
+                         sorted(map(sorted, old_merge_strands(strands))))
+
+    def test_random(self):
+
+        rng = np.random.RandomState(0)
+
+        for _ in xrange(50):
+
+            strands = []
+            for _ in xrange(rng.randint(1, 15)):
+                start = rng.randint(0, 80)
+                strands.append(range(start, start + rng.randint(1, 8)))
+
+            self.assertMerged(strands)
+
+    def test_cases(self):
+
+        # disjoint, overlapping, adjacent and duplicate strands
+        self.assertMerged([range(1, 4), range(6, 9)])
+        self.assertMerged([range(1, 4), range(3, 9)])
+        self.assertMerged([range(1, 4), range(4, 9)])
+        self.assertMerged([range(6, 9), range(1, 4), range(4, 6)])
+        self.assertMerged([range(1, 4), range(1, 4)])
+        self.assertMerged([])
+
+
+if __name__ == '__main__':
+    unittest.main()